@@ -1,7 +1,21 @@
 import pandas as pd
 import numpy as np
 from scipy import stats
-import itertools
+from openpyxl import load_workbook
+import functools
+import os
+
+try:
+    from python_calamine import CalamineWorkbook # Optional fast .xlsx reader
+except ImportError:
+    CalamineWorkbook = None
+
+# Plate geometry: rows A-H x columns 1-12, in row-major (Tecan) order
+PLATE_ROWS = np.array(list('ABCDEFGH'))
+PLATE_COLS = np.arange(1, 13).astype(str)
+WELLS = np.char.add(np.repeat(PLATE_ROWS, len(PLATE_COLS)), np.tile(PLATE_COLS, len(PLATE_ROWS)))
+
+CATEGORICAL_COLUMNS = ['Well', 'Type', 'Subject Name', 'Timepoint']
 
 def extract_grid(full_df, start_row):
     """
@@ -14,26 +28,11 @@ def extract_grid(full_df, start_row):
     Returns:
     - pd.DataFrame: Dataframe with columns ['Well', 'OD'].
     """
-    data = []
-    for r in range(8): # 8 Rows A-H
-        row_idx = start_row + r
-        # Row Label (A, B, C...)
-        if row_idx >= len(full_df): break
-        row_label = str(full_df.iloc[row_idx, 0]).strip()
-        
-        # Data values at cols 1 to 12
-        values = full_df.iloc[row_idx, 1:13].values
-        
-        for c, val in enumerate(values):
-            col_label = str(c + 1)
-            well_id = f"{row_label}{col_label}"
-            try:
-                val = float(val)
-            except:
-                val = np.nan
-            data.append({'Well': well_id, 'OD': val})
-            
-    return pd.DataFrame(data)
+    # Slice the whole value block at once (rows A-H, cols 1-12) and coerce non-numeric cells to NaN
+    block = full_df.iloc[start_row:start_row + len(PLATE_ROWS), 1:len(PLATE_COLS) + 1]
+    vals = np.asarray(pd.to_numeric(block.to_numpy().ravel(), errors='coerce'), dtype=float)
+    
+    return pd.DataFrame({'Well': WELLS[:len(vals)], 'OD': vals})
 
 def parse_tecan_excel(path):
     """
@@ -47,8 +46,45 @@ def parse_tecan_excel(path):
     
     Raises:
     - ValueError: If grids cannot be identified.
+    
+    Results are cached per (path, modification time), so re-parsing an unchanged file is free.
     """
-    df = pd.read_csv(path, sep=None, engine='python', header=None) if path.endswith('.csv') else pd.read_excel(path, header=None)
+    od450_df, od630_df = _parse_tecan_excel_cached(path, os.path.getmtime(path))
+    return od450_df.copy(), od630_df.copy()
+
+def _read_tecan_sheet(path):
+    # First sheet, cached values only. python-calamine (if installed) parses the
+    # sheet natively; otherwise openpyxl streams it in read-only mode.
+    if CalamineWorkbook is not None:
+        sheet = CalamineWorkbook.from_path(path).get_sheet_by_index(0)
+        return _tecan_rows_to_frame(sheet.to_python(skip_empty_area=False))
+    
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return _tecan_rows_to_frame(wb.worksheets[0].iter_rows(max_col=len(PLATE_COLS) + 1, values_only=True))
+    finally:
+        wb.close()
+
+def _tecan_rows_to_frame(rows):
+    # Keep the label + 12 data columns and stop as soon as the second (630nm) grid is complete
+    width = len(PLATE_COLS) + 1
+    kept = []
+    markers = 0
+    last_row = None
+    for i, row in enumerate(rows):
+        row = tuple(row[:width])
+        kept.append(row + (None,) * (width - len(row)))
+        if row and row[0] == '<>':
+            markers += 1
+            if markers == 2:
+                last_row = i + len(PLATE_ROWS)
+        if i == last_row:
+            break
+    return pd.DataFrame(kept, columns=range(width))
+
+@functools.lru_cache(maxsize=8)
+def _parse_tecan_excel_cached(path, mtime):
+    df = pd.read_csv(path, sep=None, engine='python', header=None) if path.endswith('.csv') else _read_tecan_sheet(path)
     
     # Find start of plate grids (marked by '<>')
     grid_starts = df.index[df.iloc[:, 0] == '<>'].tolist()
@@ -61,6 +97,25 @@ def parse_tecan_excel(path):
     
     return od450_df, od630_df
 
+def read_layout(path):
+    """
+    Reads a plate layout CSV exported by the designer.
+    
+    Parameters:
+    - path (str): Path to the layout CSV.
+    
+    Returns:
+    - pd.DataFrame: One row per well, as written by the designer.
+    
+    Results are cached per (path, modification time), so loading the files and
+    then preparing the dataset parses the layout only once.
+    """
+    return _read_layout_cached(path, os.path.getmtime(path)).copy()
+
+@functools.lru_cache(maxsize=8)
+def _read_layout_cached(path, mtime):
+    return pd.read_csv(path)
+
 def merge_and_correct(layout_df, od450_df, od630_df):
     """
     Merges Layout with OD data and calculates corrected OD.
@@ -73,10 +128,28 @@ def merge_and_correct(layout_df, od450_df, od630_df):
     Returns:
     - pd.DataFrame: Merged dataframe with 'OD_Corr' column.
     """
-    od_df = pd.merge(od450_df, od630_df, on='Well', suffixes=('_450', '_630'))
-    od_df['OD_Corr'] = od_df['OD_450'] - od_df['OD_630']
+    wells = od450_df['Well'].to_numpy()
+    od_450 = od450_df['OD'].to_numpy()
+    
+    # Grids from extract_grid share the same well order, so the 630nm values line up positionally
+    if np.array_equal(wells, od630_df['Well'].to_numpy()):
+        od_630 = od630_df['OD'].to_numpy()
+    else:
+        od_630 = od630_df.set_index('Well')['OD'].reindex(wells).to_numpy()
+    
+    od_columns = {'OD_450': od_450, 'OD_630': od_630, 'OD_Corr': od_450 - od_630}
     
-    merged_df = pd.merge(layout_df, od_df, on='Well', how='left')
+    # Left-join onto the layout with one positional lookup per well instead of a merge
+    pos = pd.Index(wells).get_indexer(layout_df['Well'])
+    found = pos >= 0
+    merged_df = layout_df.copy()
+    for col, vals in od_columns.items():
+        merged_df[col] = np.where(found, vals[pos], np.nan)
+    
+    # Low-cardinality labels: categorical codes make later masks/groupbys integer-based
+    for col in CATEGORICAL_COLUMNS:
+        if col in merged_df:
+            merged_df[col] = merged_df[col].astype('category')
     return merged_df
 
 def fit_calibration_model(df):
@@ -89,19 +162,33 @@ def fit_calibration_model(df):
     Returns:
     - dict: {'slope', 'intercept', 'r_squared'} of the model.
     - pd.DataFrame: The mean ODs per concentration (for plotting).
+    
+    Raises:
+    - ValueError: If the standards do not span at least two concentrations.
     """
-    cal_data = df[df['Type'] == 'Calibration'].copy()
+    # Read-only selection of the two needed columns; no copy required
+    cal_data = df.loc[df['Type'] == 'Calibration', ['Concentration', 'OD_Corr']]
     if cal_data.empty:
         return None, None
         
     cal_means = cal_data.groupby('Concentration')['OD_Corr'].mean().reset_index()
     
-    slope, intercept, r_value, p_value, std_err = stats.linregress(cal_means['Concentration'], cal_means['OD_Corr'])
+    # Closed-form OLS (avoids linregress' validation and unused stderr/p-value work)
+    x = cal_means['Concentration'].to_numpy(dtype=float)
+    y = cal_means['OD_Corr'].to_numpy(dtype=float)
+    dx = x - x.mean()
+    dy = y - y.mean()
+    sxy = (dx * dy).sum()
+    sxx = (dx * dx).sum()
+    syy = (dy * dy).sum()
+    if sxx == 0:
+        raise ValueError("Cannot fit the calibration curve: all standards have the same concentration.")
+    slope = sxy / sxx
     
     model = {
         'slope': slope,
-        'intercept': intercept,
-        'r_squared': r_value**2
+        'intercept': y.mean() - slope * x.mean(),
+        'r_squared': sxy**2 / (sxx * syy) if syy else 0.0 # Flat standards: no correlation (as linregress)
     }
     return model, cal_means
 
@@ -120,14 +207,84 @@ def calculate_concentrations(df, model):
         df['Calculated_Conc'] = np.nan
         return df
 
-    def get_conc(row):
-        if row['Type'] == 'Experiment':
-            return (row['OD_Corr'] - model['intercept']) / model['slope']
-        return row['Concentration']
-
-    df['Calculated_Conc'] = df.apply(get_conc, axis=1)
+    od = df['OD_Corr'].to_numpy()
+    is_exp = (df['Type'] == 'Experiment').to_numpy()
+    conc = df['Concentration'].to_numpy()
+    df['Calculated_Conc'] = np.where(is_exp, (od - model['intercept']) / model['slope'], conc)
     return df
 
+def prepare_dataset(layout_path, instrument_path):
+    """
+    Runs the upstream pipeline (parse, merge & correct, calibrate, calculate concentrations).
+    
+    Parameters:
+    - layout_path (str): Path to the Layout CSV.
+    - instrument_path (str): Path to the Tecan Excel/CSV file.
+    
+    Returns:
+    - pd.DataFrame: Merged dataframe with 'OD_Corr' and 'Calculated_Conc' columns.
+    - dict: The calibration model (or None).
+    - pd.DataFrame: The mean ODs per concentration (or None).
+    
+    Results are cached per (path, modification time) of both files, so re-running
+    the statistics with a different configuration skips the I/O and merge stages.
+    """
+    analyzed_df, model, cal_means = _prepare_dataset_cached(
+        layout_path, os.path.getmtime(layout_path),
+        instrument_path, os.path.getmtime(instrument_path)
+    )
+    return (
+        analyzed_df.copy(),
+        dict(model) if model else model,
+        cal_means.copy() if cal_means is not None else None
+    )
+
+@functools.lru_cache(maxsize=8)
+def _prepare_dataset_cached(layout_path, layout_mtime, instrument_path, instrument_mtime):
+    layout_df = _read_layout_cached(layout_path, layout_mtime)
+    od450_df, od630_df = parse_tecan_excel(instrument_path)
+    merged_df = merge_and_correct(layout_df, od450_df, od630_df)
+    model, cal_means = fit_calibration_model(merged_df)
+    analyzed_df = calculate_concentrations(merged_df, model)
+    return analyzed_df, model, cal_means
+
+def _group_mean_std_count(keys, values):
+    # Fused mean/std/count per combination of the key Series, on integer group codes.
+    # Equivalent to groupby([k.name for k in keys]).agg(['mean', 'std', 'count']).reset_index()
+    codes = np.zeros(len(values), dtype=np.int64)
+    keep = np.ones(len(values), dtype=bool)
+    uniques = []
+    for key in keys:
+        key_codes, key_uniques = pd.factorize(key, sort=True)
+        keep &= key_codes >= 0
+        codes = codes * len(key_uniques) + key_codes
+        uniques.append(key_uniques)
+    
+    group_ids, group = np.unique(codes[keep], return_inverse=True)
+    n_groups = len(group_ids)
+    
+    vals = values.to_numpy(dtype=float)[keep]
+    valid = ~np.isnan(vals)
+    count = np.bincount(group, weights=valid, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(group, weights=np.where(valid, vals, 0.0), minlength=n_groups) / count
+        dev = np.where(valid, vals - mean[group], 0.0)
+        std = np.sqrt(np.bincount(group, weights=dev * dev, minlength=n_groups) / (count - 1))
+    std[count < 2] = np.nan
+    
+    # Decode the mixed-radix group ids back into one column per key
+    columns = {}
+    rest = group_ids
+    for key, key_uniques in reversed(list(zip(keys, uniques))):
+        columns[key.name] = key_uniques[rest % len(key_uniques)]
+        rest = rest // len(key_uniques)
+    
+    result = pd.DataFrame({key.name: columns[key.name] for key in keys})
+    result['mean'] = mean
+    result['std'] = std
+    result['count'] = count.astype(int)
+    return result
+
 def run_statistical_analysis(exp_df, config):
     """
     Runs statistical tests based on configuration.
@@ -142,48 +299,62 @@ def run_statistical_analysis(exp_df, config):
     results = {}
     
     # 1. Clean Subject Names
-    exp_df['Subject Name'] = exp_df['Subject Name'].fillna('')
-    exp_df['Subject Name'] = exp_df.apply(
-        lambda row: f"Subject {int(row['Subject'])}" if str(row['Subject Name']).strip() == '' or str(row['Subject Name']).lower() == 'nan' else row['Subject Name'], 
-        axis=1
-    )
+    names = exp_df['Subject Name'].astype(object).fillna('').astype(str)
+    blank = names.str.strip().eq('') | names.str.lower().eq('nan')
+    # Defaults only for blank rows: a named row may carry a missing Subject ID
+    default_names = 'Subject ' + exp_df.loc[blank, 'Subject'].astype(int).astype(str)
+    exp_df['Subject Name'] = names.mask(blank, default_names)
     
     # 2. CV Calculation
-    grouped = exp_df.groupby(['Subject', 'Subject Name', 'Timepoint'])['Calculated_Conc'].agg(['mean', 'std', 'count']).reset_index()
-    grouped['CV_Percent'] = (grouped['std'] / grouped['mean']) * 100
+    # Subject Name stays a key: Subject IDs restart in every experiment, so the ID alone can pool two subjects
+    conc = exp_df['Calculated_Conc']
+    cv = _group_mean_std_count([exp_df['Subject'], exp_df['Subject Name'], exp_df['Timepoint']], conc)
+    cv['CV_Percent'] = (cv['std'] / cv['mean']) * 100
     
-    high_cv = grouped[grouped['CV_Percent'] > 20]
+    high_cv = cv[cv['CV_Percent'] > 20]
     if not high_cv.empty:
         results['High_CV'] = high_cv
         
-    # 3. Pivot for Testing
-    # Use 'Subject' (ID) as index to avoid duplicates if names are identical
-    pivoted = grouped.pivot(index='Subject', columns='Timepoint', values='mean')
-    
+    # 3. Align Timepoints for Testing
+    # Pair on (Subject, Subject Name), the same groups as the CV table: the ID keeps
+    # same-named subjects apart, the name keeps subjects of different experiments apart
+    grouped = cv
     selected_tps = config['timepoints']
-    valid_tps = [tp for tp in selected_tps if tp in pivoted.columns]
+    present_tps = set(grouped['Timepoint'])
+    valid_tps = [tp for tp in selected_tps if tp in present_tps]
     
     if len(valid_tps) < 2: return results # Not enough data
     
+    per_tp = [grouped.loc[grouped['Timepoint'] == tp].set_index(['Subject', 'Subject Name'])['mean'] for tp in valid_tps]
+    
     if config['paired']:
-        clean_data = pivoted[valid_tps].dropna()
-        arrays = [clean_data[tp] for tp in valid_tps]
+        # Column-stack subjects present at every timepoint, then drop rows with a missing mean
+        if len(per_tp) == 2:
+            # Common two-timepoint case: align both Series on their shared subjects, no concat frame
+            shared = per_tp[0].index.intersection(per_tp[1].index)
+            matrix = np.column_stack([s.reindex(shared).to_numpy(dtype=float) for s in per_tp])
+        else:
+            matrix = pd.concat(per_tp, axis=1, join='inner').to_numpy(dtype=float)
+        # One column-major float64 block: every test below gets contiguous column views, no copies
+        matrix = np.asfortranarray(matrix[~np.isnan(matrix).any(axis=1)])
+        arrays = [matrix[:, i] for i in range(len(valid_tps))]
     else:
-        arrays = [pivoted[tp].dropna() for tp in valid_tps]
+        # Independent groups: one NaN mask per column on the raw arrays, no per-column dropna Series
+        arrays = [vals[~np.isnan(vals)] for vals in (s.to_numpy(dtype=float) for s in per_tp)]
+    
+    # Materialized once as contiguous float64 (no-op for the views above) and reused by every test below
+    arrays = [np.ascontiguousarray(arr, dtype=np.float64) for arr in arrays]
         
     if any(len(arr) < 3 for arr in arrays): return results # Too few samples
     
     # 4. Normality & Homogeneity
-    normality_passed = True
-    shapiro_results = {}
-    for tp, arr in zip(valid_tps, arrays):
-        if len(arr) >= 3:
-            _, p = stats.shapiro(arr)
-            shapiro_results[tp] = p
-            if p < 0.05: normality_passed = False
-        else:
-             shapiro_results[tp] = np.nan
-    results['shapiro'] = shapiro_results
+    if config['paired']:
+        # Equal-length columns: a single vectorized Shapiro-Wilk call across all timepoints
+        _, shapiro_p = stats.shapiro(matrix, axis=0)
+    else:
+        shapiro_p = [stats.shapiro(arr)[1] for arr in arrays]
+    normality_passed = not any(p < 0.05 for p in shapiro_p)
+    results['shapiro'] = dict(zip(valid_tps, shapiro_p))
     
     try:
         _, p_levene = stats.levene(*arrays)
@@ -235,40 +406,45 @@ def run_statistical_analysis(exp_df, config):
     
     # 6. Post-Hoc
     if config['posthoc'] and p_val < 0.05:
-        posthoc_res = []
-        combinations = list(itertools.combinations(enumerate(valid_tps), 2))
-        alpha_corrected = 0.05 / len(combinations)
+        # All (i < j) timepoint index pairs as two int arrays
+        pairs_i, pairs_j = np.triu_indices(len(valid_tps), k=1)
+        n_pairs = len(pairs_i)
         
-        for (idx1, name1), (idx2, name2) in combinations:
+        # Fill parallel arrays in the loop; significance is assigned in one vectorized pass afterwards
+        ph_names = [None] * n_pairs
+        ph_tests = [None] * n_pairs
+        ph_pvals = np.empty(n_pairs)
+        
+        for k, (idx1, idx2) in enumerate(zip(pairs_i.tolist(), pairs_j.tolist())):
             arr1 = arrays[idx1]
             arr2 = arrays[idx2]
             
-            ph_test = ""
-            ph_p = 1.0
-            
             if "T-Test" in decision or "ANOVA" in decision:
                 if config['paired']:
-                     ph_test = "Paired T-Test"
-                     _, ph_p = stats.ttest_rel(arr1, arr2)
+                     ph_tests[k] = "Paired T-Test"
+                     _, ph_pvals[k] = stats.ttest_rel(arr1, arr2)
                 else:
-                     ph_test = "Unpaired T-Test"
-                     _, ph_p = stats.ttest_ind(arr1, arr2)
+                     ph_tests[k] = "Unpaired T-Test"
+                     _, ph_pvals[k] = stats.ttest_ind(arr1, arr2)
             else:
                  if config['paired']:
-                     ph_test = "Wilcoxon"
-                     _, ph_p = stats.wilcoxon(arr1, arr2)
+                     ph_tests[k] = "Wilcoxon"
+                     _, ph_pvals[k] = stats.wilcoxon(arr1, arr2)
                  else:
-                     ph_test = "Mann-Whitney"
-                     _, ph_p = stats.mannwhitneyu(arr1, arr2)
+                     ph_tests[k] = "Mann-Whitney"
+                     _, ph_pvals[k] = stats.mannwhitneyu(arr1, arr2)
             
-            sig = "*" if ph_p < alpha_corrected else "ns"
-            posthoc_res.append({
-                'Comparison': f"{name1} vs {name2}",
-                'Test': ph_test,
-                'P-Value': ph_p,
-                'Sig (Bonf)': sig
-            })
+            ph_names[k] = f"{valid_tps[idx1]} vs {valid_tps[idx2]}"
             
-        results['posthoc'] = pd.DataFrame(posthoc_res)
+        # Bonferroni: scale all p-values by the number of comparisons at once (capped at 1)
+        ph_adj = np.minimum(ph_pvals * n_pairs, 1.0)
+        
+        results['posthoc'] = pd.DataFrame({
+            'Comparison': ph_names,
+            'Test': ph_tests,
+            'P-Value': ph_pvals,
+            'P-Adj': ph_adj,
+            'Sig (Bonf)': np.where(ph_adj < 0.05, "*", "ns")
+        })
         
     return results
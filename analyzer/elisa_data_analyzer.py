@@ -1,11 +1,7 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy import stats # Kept for stats.sem in plotting
 # core imported below
 from openpyxl import load_workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, simpledialog
@@ -13,10 +9,11 @@ import elisa_core
 
 class AnalysisConfigDialog:
     def __init__(self, parent, timepoints):
+        # timepoints: already unique and sorted (the analyzer's cached Timepoint labels)
         self.top = tk.Toplevel(parent)
         self.top.title("Analysis Options")
         self.result = None
-        self.timepoints = sorted(list(timepoints))
+        self.timepoints = list(timepoints)
         
         tk.Label(self.top, text="Select Timepoints to Compare:", font=('Arial', 10, 'bold')).pack(pady=5)
         
@@ -25,9 +22,8 @@ class AnalysisConfigDialog:
         frame_tp.pack(pady=5, padx=10)
         
         for tp in self.timepoints:
-            var = tk.BooleanVar(value=True)
-            self.vars[tp] = var
-            tk.Checkbutton(frame_tp, text=tp, variable=var).pack(anchor='w')            
+            self.vars[tp] = tk.BooleanVar(value=True)
+            tk.Checkbutton(frame_tp, text=tp, variable=self.vars[tp]).pack(anchor='w')
         tk.Label(self.top, text="Configuration:", font=('Arial', 10, 'bold')).pack(pady=5)
         
         # Paired
@@ -75,22 +71,36 @@ class ElisaAnalyzer:
         self.od630_df = None
         self.merged_df = None
         self.analyzed_df = None
+        self.exp_df = None
+        self.cal_df = None
+        self.subject_codes = None
+        self.timepoint_codes = None
+        self.subject_labels = None
+        self.timepoint_labels = None
         self.calibration_model = None
         self.stats_results = {}
         self.layout_path = ""
         self.instrument_path = ""
         self.config = None
-        self.root = tk.Tk()
-        self.root.withdraw()
+        self.root = None # Hidden Tk root, created on first GUI use (see _get_root)
 
     def __del__(self):
         try:
-            self.root.destroy()
+            if self.root is not None:
+                self.root.destroy()
         except:
             pass
 
+    def _get_root(self):
+        """Returns the hidden Tk root, creating it on first use so batch/headless runs never start Tcl."""
+        if self.root is None:
+            self.root = tk.Tk()
+            self.root.withdraw()
+        return self.root
+
     def load_files(self):
         """Opens file dialogs for Layout CSV and Instrument Excel."""
+        self._get_root()
         # 1. Select Layout CSV
         messagebox.showinfo("Select File", "Please select the Layout CSV file.")
         layout_path = filedialog.askopenfilename(title="Select Layout CSV", filetypes=[("CSV files", "*.csv")])
@@ -105,7 +115,7 @@ class ElisaAnalyzer:
         self.instrument_path = instrument_path
         
         try:
-            self.layout_df = pd.read_csv(layout_path)
+            self.layout_df = elisa_core.read_layout(layout_path)
             self.parse_instrument_excel(instrument_path)
             return True
         except Exception as e:
@@ -114,53 +124,51 @@ class ElisaAnalyzer:
 
     def parse_instrument_excel(self, path):
         """Robustly parses Tecan Excel using core logic."""
-        try:
-            self.od450_df, self.od630_df = elisa_core.parse_tecan_excel(path)
-            print("Successfully extracted OD450 and OD630 grids.")
-        except Exception as e:
-            raise e
-
-    # extract_grid removed (moved to core)
+        self.od450_df, self.od630_df = elisa_core.parse_tecan_excel(path)
+        print("Successfully extracted OD450 and OD630 grids.")
 
     def process_data(self):
         """Merges data, corrects OD, and runs calibration using core logic."""
-        # 1. Merge & Correct
-        self.merged_df = elisa_core.merge_and_correct(self.layout_df, self.od450_df, self.od630_df)
+        # Merge & Correct -> Calibration -> Concentrations (cached per file version)
+        self.analyzed_df, self.calibration_model, self.cal_means = elisa_core.prepare_dataset(self.layout_path, self.instrument_path)
+        self.merged_df = self.analyzed_df
         
-        # 2. Calibration
-        self.calibration_model, self.cal_means = elisa_core.fit_calibration_model(self.merged_df)
+        # Filter the Experiment / Calibration subsets once; every later stage reuses them
+        self.exp_df = self.analyzed_df[self.analyzed_df['Type'] == 'Experiment']
+        self.cal_df = self.analyzed_df[self.analyzed_df['Type'] == 'Calibration']
+        
+        # Factorize Subject Name / Timepoint once (-1 where either key is missing) for code-based aggregation
+        has_keys = self.exp_df[['Subject Name', 'Timepoint']].notna().all(axis=1)
+        self.subject_codes, self.subject_labels = pd.factorize(self.exp_df['Subject Name'].where(has_keys), sort=True)
+        self.timepoint_codes, self.timepoint_labels = pd.factorize(self.exp_df['Timepoint'].where(has_keys), sort=True)
         
         if self.calibration_model:
             print(f"Calibration: OD = {self.calibration_model['slope']:.4f} * Conc + {self.calibration_model['intercept']:.4f} (R2={self.calibration_model['r_squared']:.4f})")
-            
-        # 3. Calculate Concentrations
-        self.analyzed_df = elisa_core.calculate_concentrations(self.merged_df, self.calibration_model)
         
         return self.analyzed_df
 
     def configure_analysis(self):
         """Opens dialog to configure analysis."""
-        exp_df = self.analyzed_df[self.analyzed_df['Type'] == 'Experiment']
+        exp_df = self.exp_df
         if exp_df.empty: return False
         
-        # Get Timepoints
-        timepoints = exp_df['Timepoint'].unique()
+        # Get Timepoints: every timepoint with experiment wells, named or not
+        # (timepoint_labels only covers rows with a Subject Name, for the mean tables)
+        timepoints = sorted(exp_df['Timepoint'].dropna().unique().tolist())
         
-        self.root.update()
-        dlg = AnalysisConfigDialog(self.root, timepoints)
+        root = self._get_root()
+        root.update()
+        dlg = AnalysisConfigDialog(root, timepoints)
         
         if dlg.result:
             self.config = dlg.result
             return True
         return False
 
-    def run_calibration(self, df):
-        # Deprecated: Logic moved to process_data via elisa_core
-        return df
-
     def run_statistics(self):
         """Performs statistical analysis using core logic."""
-        exp_df = self.analyzed_df[self.analyzed_df['Type'] == 'Experiment'].copy()
+        # Copy: run_statistical_analysis normalizes 'Subject Name' in place
+        exp_df = self.exp_df.copy()
         
         if exp_df.empty:
             print("No experiment data found.")
@@ -176,11 +184,18 @@ class ElisaAnalyzer:
 
     def generate_plots(self):
         """Generates Calibration and Result plots."""
+        # Plotting libraries are only needed here; importing them lazily keeps startup fast.
+        # Figures are only saved to PNG, so use the non-interactive Agg backend (no GUI backend probing)
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         # 1. Calibration Curve
-        cal_data = self.merged_df[self.merged_df['Type'] == 'Calibration']
+        cal_data = self.cal_df
         if not cal_data.empty:
             plt.figure(figsize=(6, 4))
-            sns.regplot(x='Concentration', y='OD_Corr', data=cal_data, ci=None, label='Standards')
+            plt.scatter(cal_data['Concentration'], cal_data['OD_Corr'], label='Standards')
             
             # Add Model Line
             x_range = np.linspace(cal_data['Concentration'].min(), cal_data['Concentration'].max(), 100)
@@ -196,15 +211,22 @@ class ElisaAnalyzer:
             plt.close()
             
         # 2. Results Bar Graph
-        exp_df = self.analyzed_df[self.analyzed_df['Type'] == 'Experiment']
+        exp_df = self.exp_df
         if not exp_df.empty:
             plt.figure(figsize=(10, 6))
-            # Plot Mean Concentration per Subject/Timepoint
-            sns.barplot(x='Subject Name', y='Calculated_Conc', hue='Timepoint', data=exp_df, errorbar='se', capsize=.1)
+            # Plot Mean Concentration per Subject/Timepoint (pre-aggregated: mean +/- SE)
+            conc_mean, conc_sem = self._subject_timepoint_stats(exp_df['Calculated_Conc'])
+            n_tp = len(conc_mean.columns)
+            bar_w = 0.8 / max(n_tp, 1) # No named subjects: empty axes rather than a ZeroDivisionError
+            x = np.arange(len(conc_mean.index))
+            for k, tp in enumerate(conc_mean.columns):
+                plt.bar(x - 0.4 + bar_w * (k + 0.5), conc_mean[tp], width=bar_w, yerr=conc_sem[tp], capsize=3, label=tp)
             
             plt.title("Insulin concentration in time")
+            plt.xlabel("Subject Name")
             plt.ylabel("Insulin (ng/mL)")
-            plt.xticks(rotation=45)
+            plt.legend(title="Timepoint")
+            plt.xticks(x, conc_mean.index, rotation=45)
             plt.tight_layout()
             plt.savefig("results_bar_graph.png")
             plt.close()
@@ -217,21 +239,23 @@ class ElisaAnalyzer:
             if self.config:
                 plot_df = exp_df[exp_df['Timepoint'].isin(self.config['timepoints'])]
             
-            # Plot
-            # Fix Future Warning: Assign x to hue
-            ax = sns.barplot(x='Timepoint', y='Calculated_Conc', hue='Timepoint', data=plot_df, errorbar='se', capsize=.1, palette="pastel", legend=False)
+            # Plot (one aggregation feeds both the bars and the bracket height)
+            tp_stats = plot_df.groupby('Timepoint', observed=True)['Calculated_Conc'].agg(['mean', 'sem'])
+            plt.bar(range(len(tp_stats)), tp_stats['mean'], yerr=tp_stats['sem'], capsize=5,
+                    color=sns.color_palette("pastel", len(tp_stats)))
+            plt.xticks(range(len(tp_stats)), tp_stats.index)
             plt.title("Mean Insulin")
+            plt.xlabel("Timepoint")
             plt.ylabel("Insulin (ng/mL)")
             
             # Add Significance Bars
             if 'p_value' in self.stats_results and self.stats_results['p_value'] is not np.nan:
                 p_val = self.stats_results['p_value']
-                unique_tps = sorted(plot_df['Timepoint'].unique())
                 
                 # Only if 2 groups for now
-                if len(unique_tps) == 2:
+                if len(tp_stats) == 2:
                     # Get y-max for bracket placement
-                    y_max = plot_df.groupby('Timepoint')['Calculated_Conc'].mean().max() + plot_df.groupby('Timepoint')['Calculated_Conc'].apply(stats.sem).max()
+                    y_max = tp_stats['mean'].max() + tp_stats['sem'].max()
                     y_h = y_max * 1.05
                     y_h2 = y_max * 1.10
                     
@@ -281,6 +305,7 @@ class ElisaAnalyzer:
 
     def save_to_master(self):
         """Saves Raw Data + Analysis to a Master File."""
+        self._get_root()
         # 1. Ask for Master File
         messagebox.showinfo("Master File", "Please select the Master Excel File to append results to.")
         master_path = filedialog.askopenfilename(title="Select Master File", filetypes=[("Excel files", "*.xlsx")])
@@ -288,7 +313,7 @@ class ElisaAnalyzer:
         
         # 2. Ask for Sheet Name (Loop for Validation)
         while True:
-            sheet_name = simpledialog.askstring("Sheet Name", "Enter a name for the new sheet:\n(Max 31 chars, no \\ / ? * [ ] :)", parent=self.root)
+            sheet_name = simpledialog.askstring("Sheet Name", "Enter a name for the new sheet:\n(Max 31 chars, no \\ / ? * [ ] :)", parent=self._get_root())
             if not sheet_name: return # Cancelled
             
             # Excel Invalid Chars Validation
@@ -326,14 +351,20 @@ class ElisaAnalyzer:
             
             # --- WRITE TECAN DATA ---
             try:
-                wb_instr = load_workbook(self.instrument_path)
-                ws_instr = wb_instr.active # Assuming first sheet
-                
-                # Copy all rows
-                for row in ws_instr.iter_rows(values_only=True):
-                    ws.append(row)
+                # Stream cell values only; styles and formulas are never materialized
+                wb_instr = load_workbook(self.instrument_path, read_only=True, data_only=True)
+                try:
+                    ws_instr = wb_instr.active # Assuming first sheet
+                    
+                    # Copy all rows
+                    n_rows = 0
+                    for row in ws_instr.iter_rows(values_only=True):
+                        ws.append(row)
+                        n_rows += 1
+                finally:
+                    wb_instr.close()
                 
-                current_row = ws.max_row + 4 # Add gap
+                current_row = n_rows + 4 # Add gap
             except Exception as e:
                 print(f"Error copying Tecan data: {e}")
                 ws.cell(row=current_row, column=1, value="Error copying Tecan data")
@@ -348,124 +379,107 @@ class ElisaAnalyzer:
         except Exception as e:
              messagebox.showerror("Error", f"Failed to save to Master File:\n{e}")
 
+    def _subject_timepoint_stats(self, values):
+        """Mean and standard error of values per (Subject Name, Timepoint) as Subject x Timepoint tables, using the cached codes."""
+        n_subj, n_tp = len(self.subject_labels), len(self.timepoint_labels)
+        vals = values.to_numpy(dtype=float)
+        keep = (self.subject_codes >= 0) & (self.timepoint_codes >= 0)
+        flat = self.subject_codes[keep] * n_tp + self.timepoint_codes[keep]
+        
+        # Groups that exist but hold only NaN values stay NaN, like groupby().mean()
+        valid = ~np.isnan(vals[keep])
+        flat, vals = flat[valid], vals[keep][valid]
+        counts = np.bincount(flat, minlength=n_subj * n_tp)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.bincount(flat, weights=vals, minlength=n_subj * n_tp) / counts
+            sq_dev = np.bincount(flat, weights=(vals - means[flat]) ** 2, minlength=n_subj * n_tp)
+            sems = np.sqrt(sq_dev / (counts - 1) / counts)
+        sems[counts < 2] = np.nan
+        
+        def to_table(arr):
+            return pd.DataFrame(arr.reshape(n_subj, n_tp), index=self.subject_labels, columns=self.timepoint_labels)
+        return to_table(means), to_table(sems)
+
     def _write_analysis_to_sheet(self, ws, start_row=1):
         """Writes the standard analysis tables to the given worksheet starting at start_row."""
-        current_row = start_row
+        # Build the whole block as a list of rows (blank rows are []), then stream it into the sheet
+        rows = []
         
         # --- SECTION 0: Summary Metrics (New) ---
-        ws.cell(row=current_row, column=1, value="Metric")
-        ws.cell(row=current_row, column=2, value="Value")
-        ws.cell(row=current_row, column=3, value="Test")
-        
+        rows.append(["Metric", "Value", "Test"])
         if 'p_value' in self.stats_results:
-            ws.cell(row=current_row+1, column=1, value="P-Value")
-            ws.cell(row=current_row+1, column=2, value=self.stats_results['p_value'])
-            ws.cell(row=current_row+1, column=3, value=self.stats_results.get('test_decision', 'N/A'))
-        
-        current_row += 4
+            rows.append(["P-Value", self.stats_results['p_value'], self.stats_results.get('test_decision', 'N/A')])
+        else:
+            rows.append([])
+        rows += [[], []]
         
         # --- SECTION 1: Calibration Equation ---
-        ws.cell(row=current_row, column=1, value="Calibration Curve")
+        rows.append(["Calibration Curve"])
         if self.calibration_model:
             eq = f"y = {self.calibration_model['slope']:.4f}x + {self.calibration_model['intercept']:.4f}"
             r2 = f"R2 = {self.calibration_model['r_squared']:.4f}"
-            ws.cell(row=current_row+1, column=1, value=eq)
-            ws.cell(row=current_row+2, column=1, value=r2)
+            rows += [[eq], [r2]]
         else:
-            ws.cell(row=current_row+1, column=1, value="No Calibration Data")
-        
-        current_row += 4
+            rows += [["No Calibration Data"], []]
+        rows.append([])
 
         # --- SECTION 2: Calibration Data Table ---
         if self.cal_means is not None:
-            ws.cell(row=current_row, column=1, value="Calibration Data")
-            ws.cell(row=current_row+1, column=1, value="Insulin (ng/mL)")
-            ws.cell(row=current_row+1, column=2, value="Mean Abs")
-            
-            cal_rows = list(dataframe_to_rows(self.cal_means, index=False, header=False))
-            for r_idx, row in enumerate(cal_rows, 1):
-                ws.cell(row=current_row+1+r_idx, column=1, value=row[0])
-                ws.cell(row=current_row+1+r_idx, column=2, value=row[1])
-            
-            current_row += len(cal_rows) + 3
+            rows.append(["Calibration Data"])
+            rows.append(["Insulin (ng/mL)", "Mean Abs"])
+            rows += self.cal_means[['Concentration', 'OD_Corr']].to_numpy().tolist()
+            rows.append([])
 
         # --- PREPARE EXPERIMENT DATA ---
-        exp_df = self.analyzed_df[self.analyzed_df['Type'] == 'Experiment'].copy()
+        exp_df = self.exp_df
         if not exp_df.empty:
             # Pivot 1: Mean Absorbance (OD_Corr)
-            mean_abs = exp_df.groupby(['Subject Name', 'Timepoint'])['OD_Corr'].mean().reset_index()
-            pivot_abs = mean_abs.pivot(index='Subject Name', columns='Timepoint', values='OD_Corr')
+            pivot_abs, _ = self._subject_timepoint_stats(exp_df['OD_Corr'])
             
             # Pivot 2: Mean Concentration
-            mean_conc = exp_df.groupby(['Subject Name', 'Timepoint'])['Calculated_Conc'].mean().reset_index()
-            pivot_conc = mean_conc.pivot(index='Subject Name', columns='Timepoint', values='Calculated_Conc')
+            pivot_conc, _ = self._subject_timepoint_stats(exp_df['Calculated_Conc'])
 
             # --- SECTION 3: Mean Absorbance Table ---
-            ws.cell(row=current_row, column=1, value="Mean Absorbance")
-            
-            # Write Header (Timepoints)
-            for c_idx, col_name in enumerate(pivot_abs.columns, 2):
-                ws.cell(row=current_row+1, column=c_idx, value=col_name)
-            
-            # Write Rows (Subject + Values)
-            for r_idx, (subject, row) in enumerate(pivot_abs.iterrows(), 1):
-                ws.cell(row=current_row+1+r_idx, column=1, value=subject)
-                for c_idx, val in enumerate(row, 2):
-                    ws.cell(row=current_row+1+r_idx, column=c_idx, value=val)
-            
-            current_row += len(pivot_abs) + 3
-
             # --- SECTION 4: Mean Concentration Table ---
-            ws.cell(row=current_row, column=1, value="Mean Insulin (ng/mL)")
-            
-            # Write Header
-            for c_idx, col_name in enumerate(pivot_conc.columns, 2):
-                ws.cell(row=current_row+1, column=c_idx, value=col_name)
-            
-            # Write Rows
-            for r_idx, (subject, row) in enumerate(pivot_conc.iterrows(), 1):
-                ws.cell(row=current_row+1+r_idx, column=1, value=subject)
-                for c_idx, val in enumerate(row, 2):
-                    ws.cell(row=current_row+1+r_idx, column=c_idx, value=val)
-            
-            current_row += len(pivot_conc) + 3
+            for title, pivot in (("Mean Absorbance", pivot_abs), ("Mean Insulin (ng/mL)", pivot_conc)):
+                rows.append([title])
+                rows.append([None, *pivot.columns])  # Header (Timepoints)
+                rows += [list(row) for row in pivot.itertuples(index=True, name=None)]  # Subject + Values
+                rows.append([])
 
         # --- SECTION 5: Statistics ---
-        ws.cell(row=current_row, column=1, value="Statistical Analysis (t0 vs t1)") # Label slightly hardcoded but acceptable
+        rows.append(["Statistical Analysis (t0 vs t1)"]) # Label slightly hardcoded but acceptable
         
         if 'p_value' in self.stats_results:
             # Dynamic Shapiro Output
-            r_offset = 1
             if 'shapiro' in self.stats_results:
-                for tp, p_val in self.stats_results['shapiro'].items():
-                        ws.cell(row=current_row + r_offset, column=1, value=f"Normality (Shapiro) {tp}: p={p_val:.4f}")
-                        r_offset += 1
+                rows += [[f"Normality (Shapiro) {tp}: p={p_val:.4f}"] for tp, p_val in self.stats_results['shapiro'].items()]
             
-            ws.cell(row=current_row + r_offset, column=1, value=f"Homogeneity (Levene): p={self.stats_results.get('p_levene', 'N/A'):.4f}")
-            r_offset += 2
+            rows.append([f"Homogeneity (Levene): p={self.stats_results.get('p_levene', 'N/A'):.4f}"])
+            rows.append([])
             
-            ws.cell(row=current_row + r_offset, column=1, value=f"Test: {self.stats_results.get('test_decision', 'N/A')}")
-            ws.cell(row=current_row + r_offset + 1, column=1, value=f"P-Value: {self.stats_results['p_value']}")
+            rows.append([f"Test: {self.stats_results.get('test_decision', 'N/A')}"])
+            rows.append([f"P-Value: {self.stats_results['p_value']}"])
             
             if 'posthoc' in self.stats_results:
-                    ws.cell(row=current_row + r_offset + 2, column=1, value="Post-Hoc Analysis (Bonferroni)")
-                    ph_df = self.stats_results['posthoc']
-                    ph_rows = dataframe_to_rows(ph_df, index=False, header=True)
-                    for r, row in enumerate(ph_rows):
-                        for c, val in enumerate(row):
-                            ws.cell(row=current_row + r_offset + 3 + r, column=c + 1, value=val)
-                    r_offset += len(ph_df) + 4
-            else:
-                    r_offset += 2
+                rows.append(["Post-Hoc Analysis (Bonferroni)"])
+                ph_df = self.stats_results['posthoc']
+                rows.append(ph_df.columns.tolist())
+                rows += ph_df.itertuples(index=False, name=None)
+            rows.append([])
             
             if 'High_CV' in self.stats_results:
-                    ws.cell(row=current_row + r_offset + 1, column=1, value="High CV Warnings (>20%)")
-                    high_cv = self.stats_results['High_CV']
-                    # Write CV table
-                    cv_rows = dataframe_to_rows(high_cv, index=False, header=True)
-                    for r, row in enumerate(cv_rows):
-                        for c, val in enumerate(row):
-                            ws.cell(row=current_row + r_offset + 2 + r, column=c + 1, value=val)
+                rows.append(["High CV Warnings (>20%)"])
+                high_cv = self.stats_results['High_CV']
+                # Write CV table
+                rows.append(high_cv.columns.tolist())
+                rows += high_cv.itertuples(index=False, name=None)
+
+        # The first row pins the block to start_row; ws.append continues from there
+        for c_idx, val in enumerate(rows[0], 1):
+            ws.cell(row=start_row, column=c_idx, value=val)
+        for row in rows[1:]:
+            ws.append(row)
 
     def run(self):
         """
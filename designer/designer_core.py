@@ -1,3 +1,4 @@
+import collections
 import pandas as pd
 import numpy as np
 
@@ -6,58 +7,115 @@ COLS = 8
 ROWS = 12
 COL_LABELS = [chr(i) for i in range(ord('A') + COLS - 1, ord('A') - 1, -1)]
 ROW_LABELS = [str(i + 1) for i in range(ROWS)]
+COL_LABEL_TO_IDX = {ch: i for i, ch in enumerate(COL_LABELS)}
+
+# Cell type tags shared by every cell
+TYPE_CAL = 'CAL'
+TYPE_EXP = 'EXP'
+
+# One grid_data cell; calibration wells leave exp/subj/samp/rep at 0
+Cell = collections.namedtuple('Cell', 'type exp subj samp rep conc', defaults=(0, 0, 0, 0, 0.0))
+# Export 'Type' column categories; index doubles as the packed type code
+TYPE_CATEGORIES = ['Empty', 'Calibration', 'Experiment']
+CODE_EMPTY, CODE_CAL, CODE_EXP = range(3)
+CODE_TO_TYPE = [None, TYPE_CAL, TYPE_EXP]
+
+# Packed per-well record (flat index k = r * COLS + c)
+CELL_DTYPE = np.dtype([
+    ('type', 'u1'), ('exp', 'i4'), ('subj', 'i4'),
+    ('samp', 'i4'), ('rep', 'i4'), ('conc', 'f8')
+])
+# All-empty templates, copied then overwritten at populated wells
+EMPTY_CELLS = np.zeros(ROWS * COLS, dtype=CELL_DTYPE)
+EMPTY_COLUMN = np.full(ROWS * COLS, '', dtype=object)
+
+def key(c, r):
+    """Packs a (col, row) position into its grid_data key (flat index r * COLS + c)."""
+    return r * COLS + c
+
+def unkey(k):
+    """Unpacks a grid_data key back into (col, row)."""
+    r, c = divmod(k, COLS)
+    return c, r
+
+# Well ids in export order (flat index k = r * COLS + c)
+WELL_IDS = np.char.add(np.tile(COL_LABELS, ROWS), np.repeat(ROW_LABELS, COLS))
+
+def grid_to_cells(grid_data):
+    """
+    Packs the grid dictionary into a structured array of CELL_DTYPE records.
+    
+    Parameters:
+    - grid_data (dict): Mapping key(col, row) -> Cell
+    
+    Returns:
+    - np.ndarray: ROWS * COLS records, empty wells zeroed.
+    """
+    cells = EMPTY_CELLS.copy()
+    for k, cell in grid_data.items():
+        if not cell or not 0 <= k < ROWS * COLS:
+            continue
+        code = CODE_CAL if cell.type == TYPE_CAL else CODE_EXP
+        cells[k] = (code, cell.exp, cell.subj, cell.samp, cell.rep, cell.conc)
+    return cells
 
 def grid_to_dataframe(grid_data, subject_names_dict):
     """
     Converts grid dictionary to DataFrame for export.
     
     Parameters:
-    - grid_data (dict): Mapping (col, row) -> cell_dict
+    - grid_data (dict): Mapping key(col, row) -> Cell
     - subject_names_dict (dict): Mapping (exp, subj) -> name_string
     
     Returns:
     - pd.DataFrame: Formatted for CSV export.
     """
-    data_rows = []
-    for r in range(ROWS):
-        for c in range(COLS):
-            cell = grid_data.get((c, r))
-            row_label = ROW_LABELS[r]
-            col_label = COL_LABELS[c]
-            well_id = f"{col_label}{row_label}"
-            
-            if cell:
-                c_type = cell['type']
-                if c_type == 'CAL':
-                    data_rows.append({
-                        'Well': well_id, 'Type': 'Calibration', 
-                        'Concentration': cell['conc'], 
-                        'Experiment': '', 'Subject': '', 'Timepoint': '', 'Replicate': '',
-                        'Subject Name': ''
-                    })
-                else:
-                    exp = cell['exp']
-                    subj = cell['subj']
-                    # Handle subject name lookup safely
-                    subj_name = subject_names_dict.get((exp, subj), '')
-                    
-                    data_rows.append({
-                        'Well': well_id, 'Type': 'Experiment',
-                        'Concentration': '',
-                        'Experiment': exp,
-                        'Subject': subj,
-                        'Timepoint': f"t{cell['samp']}",
-                        'Replicate': cell['rep'],
-                        'Subject Name': subj_name
-                    })
-            else:
-                data_rows.append({
-                    'Well': well_id, 'Type': 'Empty', 
-                    'Concentration': '', 'Experiment': '', 'Subject': '', 'Timepoint': '', 'Replicate': '',
-                    'Subject Name': ''
-                })
-    
-    return pd.DataFrame(data_rows)
+    return cells_to_dataframe(grid_to_cells(grid_data), subject_names_dict)
+
+def cells_to_dataframe(cells, subject_names_dict):
+    """
+    Converts packed CELL_DTYPE records to DataFrame for export.
+    
+    Parameters:
+    - cells (np.ndarray): ROWS * COLS records in flat-index order (any shape that ravels to it)
+    - subject_names_dict (dict): Mapping (exp, subj) -> name_string
+    
+    Returns:
+    - pd.DataFrame: Formatted for CSV export.
+    """
+    cells = cells.ravel()
+    is_cal = cells['type'] == CODE_CAL
+    is_exp = cells['type'] == CODE_EXP
+    
+    conc = EMPTY_COLUMN.copy()
+    exp_col = EMPTY_COLUMN.copy()
+    subj_col = EMPTY_COLUMN.copy()
+    tp_col = EMPTY_COLUMN.copy()
+    rep_col = EMPTY_COLUMN.copy()
+    name_col = EMPTY_COLUMN.copy()
+    
+    conc[is_cal] = cells['conc'][is_cal].tolist()
+    
+    exp_col[is_exp] = cells['exp'][is_exp].tolist()
+    subj_col[is_exp] = cells['subj'][is_exp].tolist()
+    # Label each distinct sample id once, then scatter
+    samp_ids, samp_inv = np.unique(cells['samp'][is_exp], return_inverse=True)
+    tp_labels = np.array([f"t{sid}" for sid in samp_ids.tolist()], dtype=object)
+    tp_col[is_exp] = tp_labels[samp_inv]
+    rep_col[is_exp] = cells['rep'][is_exp].tolist()
+    # Handle subject name lookup safely: once per distinct (exp, subj), then scatter
+    pairs, pair_inv = np.unique(np.stack([cells['exp'][is_exp], cells['subj'][is_exp]], axis=1),
+                                axis=0, return_inverse=True)
+    names = np.array([subject_names_dict.get(tuple(key), '') for key in pairs.tolist()], dtype=object)
+    name_col[is_exp] = names[pair_inv.ravel()]
+    
+    return pd.DataFrame({
+        'Well': WELL_IDS.astype(object),
+        'Type': pd.Categorical.from_codes(cells['type'], categories=TYPE_CATEGORIES),
+        'Concentration': conc, 'Experiment': exp_col, 'Subject': subj_col,
+        'Timepoint': pd.Categorical(tp_col),
+        'Replicate': rep_col, 'Subject Name': name_col
+    }, copy=False)
 
 def dataframe_to_grid(df):
     """
@@ -68,86 +126,74 @@ def dataframe_to_grid(df):
     """
     grid_data = {}
     subject_names = {}
-    max_exp = 0
-    
-    for _, row in df.iterrows():
-        well = str(row['Well'])
-        if len(well) < 2: continue
-        
-        col_char = well[0]
-        row_str = well[1:]
-        
-        if col_char in COL_LABELS:
-            c = COL_LABELS.index(col_char)
+    
+    # Well -> (col, row) indices, parsed column-wise
+    # Row part must be a plain integer ('B3', not 'B3.0'), as int() required
+    well = df['Well'].astype(str)
+    c_arr = well.str[0].map(COL_LABEL_TO_IDX)
+    row_str = well.str[1:]
+    r_arr = pd.to_numeric(row_str.where(row_str.str.fullmatch(r'\s*[+-]?\d+\s*')), errors='coerce') - 1
+    in_plate = c_arr.between(0, COLS - 1) & r_arr.between(0, ROWS - 1)
+    
+    t = df['Type'].astype(str)
+    is_cal = (t == 'Calibration').to_numpy()
+    is_exp = (t == 'Experiment').to_numpy()
+    
+    # Unparsable concentrations become 0.0; blank ones stay NaN (not a 0 standard)
+    conc_raw = df['Concentration']
+    conc_arr = pd.to_numeric(conc_raw, errors='coerce')
+    conc_arr = conc_arr.where(conc_arr.notna() | conc_raw.isna(), 0.0)
+    exp_arr = pd.to_numeric(df['Experiment'], errors='coerce')
+    subj_arr = pd.to_numeric(df['Subject'], errors='coerce')
+    samp_arr = pd.to_numeric(df['Timepoint'].astype(str).str.replace('^[tT]', '', regex=True),
+                             errors='coerce')
+    rep_arr = pd.to_numeric(df['Replicate'], errors='coerce')
+    
+    # Malformed experiment rows (missing or non-integer fields, e.g. 't1.5') are skipped
+    exp_fields = np.column_stack([exp_arr, subj_arr, samp_arr, rep_arr]).astype(float)
+    with np.errstate(invalid='ignore'):
+        exp_ok = is_exp & (np.isfinite(exp_fields) & (exp_fields % 1 == 0)).all(axis=1)
+    mask = in_plate.to_numpy() & (is_cal | exp_ok)
+    
+    # Cast once up front; every kept value is already integral
+    cs = c_arr.to_numpy()[mask].astype(np.int64)
+    rs = r_arr.to_numpy()[mask].astype(np.int64)
+    exp_fields = np.where(exp_ok[:, None], exp_fields, 0)[mask].astype(np.int64)
+    keys = rs * COLS + cs
+    
+    if 'Subject Name' in df.columns:
+        names = df['Subject Name'].astype(object)
+        name_arr = names.where(names.notna(), '').astype(str).to_numpy()
+    else:
+        name_arr = np.full(len(df), '', dtype=object)
+    
+    for k, cal, conc, exp, subj, samp, rep, name in zip(
+            keys.tolist(), is_cal[mask].tolist(), conc_arr[mask].tolist(),
+            *exp_fields.T.tolist(), name_arr[mask].tolist()):
+        if cal:
+            grid_data[k] = Cell(TYPE_CAL, conc=conc)
         else:
-            continue
-            
-        try:
-            r = int(row_str) - 1
-        except:
-            continue
+            if (exp, subj) not in subject_names and name:
+                subject_names[(exp, subj)] = name
             
-        if 0 <= c < COLS and 0 <= r < ROWS:
-            t = str(row['Type'])
-            if t == 'Calibration':
-                try:
-                    conc = float(row['Concentration'])
-                except:
-                    conc = 0.0
-                grid_data[(c, r)] = {
-                    'type': 'CAL',
-                    'conc': conc
-                }
-            elif t == 'Experiment':
-                 try:
-                     exp = int(row['Experiment'])
-                     subj = int(row['Subject'])
-                     
-                     tp_str = str(row['Timepoint'])
-                     if tp_str.lower().startswith('t'):
-                         samp = int(tp_str[1:])
-                     else:
-                         samp = int(float(tp_str))
-                         
-                     rep = int(row['Replicate'])
-                 except:
-                     continue # Skip malformed rows
-                 
-                 # Name
-                 name = str(row.get('Subject Name', ''))
-                 if name.lower() == 'nan': name = ''
-                 
-                 if (exp, subj) not in subject_names and name:
-                     subject_names[(exp, subj)] = name
-                 
-                 grid_data[(c, r)] = {
-                     'type': 'EXP',
-                     'exp': exp,
-                     'subj': subj,
-                     'samp': samp,
-                     'rep': rep
-                 }
-                 if exp > max_exp: max_exp = exp
+            grid_data[k] = Cell(TYPE_EXP, exp, subj, samp, rep)
 
-    # Recalculate State Logic
-    current_exp = max(1, max_exp)
-    
-    # helper logic to find max subj/samp
-    max_subj = 0
-    for cell in grid_data.values():
-        if cell.get('type') == 'EXP' and cell['exp'] == current_exp:
-            if cell['subj'] > max_subj: max_subj = cell['subj']
-            
+    # Recalculate State Logic on the parsed arrays
+    exp_rows = exp_ok[mask]
+    exps, subjs, samps = exp_fields[:, 0], exp_fields[:, 1], exp_fields[:, 2]
+    
+    # A later row for the same well overwrites an earlier one
+    final = np.zeros(len(keys), dtype=bool)
+    final[len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]] = True
+    
+    current_exp = max(1, int(exps[exp_rows].max(initial=0)))
+    
+    in_exp = final & exp_rows & (exps == current_exp)
+    max_subj = int(subjs[in_exp].max(initial=0))
     current_subj = max_subj if max_subj > 0 else 1
     
-    max_samp = 0
-    subj_has_cells = False
-    for cell in grid_data.values():
-         if cell.get('type') == 'EXP' and cell['exp'] == current_exp and cell['subj'] == current_subj:
-             subj_has_cells = True
-             if cell['samp'] > max_samp: max_samp = cell['samp']
-             
-    next_samp = max_samp + 1 if subj_has_cells else 0
+    in_subj = in_exp & (subjs == current_subj)
+    next_samp = int(samps[in_subj].max(initial=0)) + 1 if in_subj.any() else 0
     
     state = {
         'current_exp': current_exp,
@@ -157,49 +203,78 @@ def dataframe_to_grid(df):
     
     return grid_data, subject_names, state
 
-def fill_cells(c1, r1, c2, r2, current_exp, current_subj, next_sample_id, orientation):
+def fill_block(n_rows, n_cols, next_sample_id, orientation):
     """
-    Generates cell data for a selected range based on orientation.
+    Sample/replicate ids for a rectangular selection, laid out like the plate.
+    
+    Parameters:
+    - n_rows, n_cols (int): Size of the selection.
+    - next_sample_id (int): Sample ID given to the first sample.
+    - orientation (str): 'vertical' (a sample per column) or 'horizontal' (a sample per row).
+    
     Returns:
-    - dict: partial grid updates {(c, r): cell_dict}
-    - int: updated next_sample_id
+    - tuple: (samps, reps, new_next_sample_id); samps and reps are
+      (n_rows, n_cols) arrays, ready for slice assignment into the cell array.
     """
-    updates = {}
-    local_samp_id = next_sample_id
-    
-    # Validate Ranges
-    c1, c2 = min(c1, c2), max(c1, c2)
-    r1, r2 = min(r1, r2), max(r1, r2)
+    rows = np.arange(n_rows, dtype=np.int32)[:, None]
+    cols = np.arange(n_cols, dtype=np.int32)[None, :]
     
     if orientation == 'vertical':
-        # Cols define samples
-        for c in range(c1, c2 + 1):
-            s_id = local_samp_id
-            local_samp_id += 1
-            rep_count = 1
-            for r in range(r1, r2 + 1):
-               updates[(c, r)] = {
-                    'type': 'EXP',
-                    'exp': current_exp,
-                    'subj': current_subj,
-                    'samp': s_id,
-                    'rep': rep_count
-               }
-               rep_count += 1
+        samp_off, rep_off, n_samples = cols, rows, n_cols
     else:
-        # Rows define samples
-        for r in range(r1, r2 + 1):
-            s_id = local_samp_id
-            local_samp_id += 1
-            rep_count = 1
-            for c in range(c1, c2 + 1):
-                updates[(c, r)] = {
-                    'type': 'EXP',
-                    'exp': current_exp,
-                    'subj': current_subj,
-                    'samp': s_id,
-                    'rep': rep_count
-               }
-                rep_count += 1
-                
-    return updates, local_samp_id
+        samp_off, rep_off, n_samples = rows, cols, n_rows
+    
+    shape = (n_rows, n_cols)
+    samps = np.broadcast_to(next_sample_id + samp_off, shape)
+    reps = np.broadcast_to(rep_off + 1, shape)
+    return samps, reps, next_sample_id + n_samples
+
+def _well_ids(is_exp, *fields):
+    """
+    Labels each experiment well by its combination of field values.
+    
+    Returns:
+    - np.ndarray: (ROWS + 2, COLS + 2) ints; equal ids mean equal fields,
+      0 marks non-experiment wells and the one-well padding ring.
+    """
+    _, ids = np.unique(np.stack([f.ravel() for f in fields], axis=1), axis=0, return_inverse=True)
+    ids = np.where(is_exp, ids.reshape(is_exp.shape) + 1, 0)
+    return np.pad(ids, 1)
+
+def overlay_segments(cells):
+    """
+    Finds subject borders and replicate links on a (ROWS, COLS) cell array.
+    
+    A border is drawn on every side of an experiment well whose neighbour is
+    off-plate, not an experiment, or belongs to another (exp, subj). A link
+    joins horizontally/vertically adjacent replicates of the same sample.
+    
+    Returns:
+    - tuple: (borders, links); int arrays of (c1, r1, c2, r2) rows.
+      Border ends are cell corners; link ends are the cells whose centres are joined.
+    """
+    is_exp = cells['type'] == CODE_EXP
+    
+    # Identity of each well as one int: 0 for non-experiment wells and for the
+    # empty ring around the plate, so edge wells compare against "nothing"
+    subj_id = _well_ids(is_exp, cells['exp'], cells['subj'])
+    samp_id = _well_ids(is_exp, cells['exp'], cells['subj'], cells['samp'])
+    subj_here, samp_here = subj_id[1:-1, 1:-1], samp_id[1:-1, 1:-1]
+    
+    def neighbour(a, dr, dc):
+        return a[1 + dr:1 + dr + ROWS, 1 + dc:1 + dc + COLS]
+    
+    # (dr, dc) -> corner offsets of the shared side: (dc1, dr1, dc2, dr2)
+    sides = [((-1, 0), (0, 0, 1, 0)), ((1, 0), (0, 1, 1, 1)),
+             ((0, -1), (0, 0, 0, 1)), ((0, 1), (1, 0, 1, 1))]
+    borders = []
+    for (dr, dc), offsets in sides:
+        rs, cs = np.nonzero(is_exp & (neighbour(subj_id, dr, dc) != subj_here))
+        borders.append(np.column_stack([cs, rs, cs, rs]) + offsets)
+    
+    links = []
+    for dr, dc in [(0, 1), (1, 0)]:
+        rs, cs = np.nonzero(is_exp & (neighbour(samp_id, dr, dc) == samp_here))
+        links.append(np.column_stack([cs, rs, cs + dc, rs + dr]))
+    
+    return np.concatenate(borders), np.concatenate(links)
@@ -1,9 +1,10 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 import string
-import copy
+import collections
 import designer_core
 
 # Configuration
@@ -14,11 +15,20 @@ MARGIN = 50
 WIN_WIDTH = COLS * CELL_SIZE + 2 * MARGIN
 WIN_HEIGHT = ROWS * CELL_SIZE + 2 * MARGIN
 
+# Pixel geometry, computed once: cell edges (COLS + 1 / ROWS + 1 entries) and centres.
+# Kept as lists since they are read one scalar at a time.
+X_EDGES = (MARGIN + np.arange(COLS + 1) * CELL_SIZE).tolist()
+Y_EDGES = (MARGIN + np.arange(ROWS + 1) * CELL_SIZE).tolist()
+X_CENTRES = (MARGIN + (np.arange(COLS) + 0.5) * CELL_SIZE).tolist()
+Y_CENTRES = (MARGIN + (np.arange(ROWS) + 0.5) * CELL_SIZE).tolist()
+
 COL_LABELS = [chr(i) for i in range(ord('A') + COLS - 1, ord('A') - 1, -1)]
 ROW_LABELS = [str(i + 1) for i in range(ROWS)]
 
 CALIBRATION_CONCS = [6.4, 3.2, 1.6, 0.8, 0.4, 0.2, 0.1, 0.0]
 
+MAX_HISTORY = 100 # Undo steps kept
+
 # Pastel Palette for Experiments
 EXP_PALETTE = [
     "#ccffcc", # Green
@@ -29,6 +39,22 @@ EXP_PALETTE = [
     "#ffeebb", # Orange-ish
 ]
 
+# PNG export fonts, loaded on first export and reused afterwards
+_FONT = None
+_SMALL_FONT = None
+
+def _get_fonts():
+    """Returns (font, small_font): arial.ttf if available, else the default bitmap font."""
+    global _FONT, _SMALL_FONT
+    if _FONT is None:
+        try:
+            _FONT = ImageFont.truetype("arial.ttf", 14)
+            _SMALL_FONT = ImageFont.truetype("arial.ttf", 9)
+        except:
+            _FONT = ImageFont.load_default()
+            _SMALL_FONT = ImageFont.load_default()
+    return _FONT, _SMALL_FONT
+
 class ElisaPlateDesigner:
     def __init__(self, root):
         self.root = root
@@ -38,12 +64,13 @@ class ElisaPlateDesigner:
         except:
             pass # Ignore if not supported
         
-        # Data Structure: (col, row) -> dict
-        # { 'type': 'CAL' or 'EXP', 'exp': int, 'subj': int, 'samp': int, 'rep': int, 'conc': float/None }
-        self.grid_data = {}
+        # Data Structure: (ROWS, COLS) array of designer_core.CELL_DTYPE records,
+        # one field per attribute: cells['type'] (CODE_EMPTY/CAL/EXP), ['exp'], ['subj'], ['samp'], ['rep'], ['conc']
+        self.cells = designer_core.EMPTY_CELLS.reshape(ROWS, COLS).copy()
+        self._dirty = np.ones((ROWS, COLS), dtype=bool) # Wells draw_grid still has to refresh
         
         # State
-        self.history = []
+        self.history = collections.deque(maxlen=MAX_HISTORY)
         self.current_exp = 1
         self.current_subj = 1
         self.next_sample_id = 0 # Next sample ID for the current subject (t0)
@@ -52,13 +79,20 @@ class ElisaPlateDesigner:
         
         # Sidebar State
         self.subject_names = {} # (exp, subj) -> StringVar
+        self._name_cache = {} # (exp, subj) -> str, kept in sync by the StringVar traces
+        self._pending_names = {} # (exp, subj) -> str from import, turned into StringVars when shown
         self.sidebar_widgets = {} # (exp, subj) -> Frame
+        self._last_subjs = frozenset() # Subjects the sidebar was last built for
         self.exp_headers = {} # exp -> Label
         
         # Selection
         self.start_sel = None
         self.cur_sel = None
         
+        # Deferred redraw (coalesced per idle cycle)
+        self._redraw_pending = False
+        self._redraw_grid = False
+        
         self._init_grid_data()
         self._init_ui()
         self.update_status()
@@ -66,13 +100,19 @@ class ElisaPlateDesigner:
     def _init_grid_data(self):
         # Initialize calibration rows (0 and 1)
         # Cols A(0) -> H(7) map to concentrations
-        for r in [0, 1]:
-            for c in range(COLS):
-                self.grid_data[(c, r)] = {
-                    'type': 'CAL',
-                    'conc': CALIBRATION_CONCS[c],
-                    'id_str': f"Cal {CALIBRATION_CONCS[c]}"
-                }
+        self.cells['type'][0:2] = designer_core.CODE_CAL
+        self.cells['conc'][0:2] = CALIBRATION_CONCS
+
+    def _cell_look(self, code, exp, subj, samp, conc):
+        # (fill, outline, text) of one well; shared by the canvas and the PNG export
+        if code == designer_core.CODE_CAL:
+            return "#ffcccc", "#ff8888", f"{conc}" # Light red for Cal
+        if code == designer_core.CODE_EXP:
+            # Cycle colors based on Experiment ID
+            color_idx = (exp - 1) % len(EXP_PALETTE)
+            s_name = self._name_cache.get((exp, subj)) or f"S{subj}"
+            return EXP_PALETTE[color_idx], "gray", f"{s_name}\nt{samp}"
+        return "white", "lightgray", ""
 
     def _init_ui(self):
         # Main Layout
@@ -158,14 +198,18 @@ class ElisaPlateDesigner:
         menubar.add_cascade(label="File", menu=filemenu)
         self.root.config(menu=menubar)
         
+        self._build_static_items()
         self.draw_grid()
 
     def refresh_sidebar(self):
         # Identify current unique subjects
-        current_subjs = set()
-        for cell in self.grid_data.values():
-            if cell['type'] == 'EXP':
-                current_subjs.add((cell['exp'], cell['subj']))
+        is_exp = self.cells['type'] == designer_core.CODE_EXP
+        current_subjs = frozenset(zip(self.cells['exp'][is_exp].tolist(), self.cells['subj'][is_exp].tolist()))
+        
+        # Same subjects as last time (e.g. more samples for an existing subject): nothing to rebuild
+        if current_subjs == self._last_subjs:
+            return
+        self._last_subjs = current_subjs
         
         sorted_subjs = sorted(list(current_subjs))
         
@@ -212,7 +256,7 @@ class ElisaPlateDesigner:
             for subj in sorted(grouped[exp]):
                 key = (exp, subj)
                 if key not in self.subject_names:
-                    self.subject_names[key] = tk.StringVar()
+                    self.subject_names[key] = tk.StringVar(value=self._pending_names.pop(key, ""))
                 
                 # Add trace to auto-update grid when name changes
                 # Only add if not already added? trace persists on the variable.
@@ -228,7 +272,7 @@ class ElisaPlateDesigner:
                 # So we only init once.
                 
                 if not self.subject_names[key].trace_info():
-                     self.subject_names[key].trace_add("write", lambda *args: self.draw_grid())
+                     self.subject_names[key].trace_add("write", lambda *args, key=key: self.on_name_change(key))
 
                 f = tk.Frame(self.sidebar_inner, bg="#f0f0f0")
                 f.pack(fill=tk.X, padx=10, pady=2)
@@ -239,135 +283,130 @@ class ElisaPlateDesigner:
                 entry = tk.Entry(f, textvariable=self.subject_names[key])
                 entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
-    def draw_grid(self):
-        self.canvas.delete("all")
-        
-        # Draw Labels
+    def _build_static_items(self):
+        # Labels plus one persistent rectangle/text item per well;
+        # draw_grid only reconfigures these
         for c in range(COLS):
-            x = MARGIN + c * CELL_SIZE + CELL_SIZE / 2
-            self.canvas.create_text(x, MARGIN / 2, text=COL_LABELS[c], font=("Arial", 11, "bold"))
+            self.canvas.create_text(X_CENTRES[c], MARGIN / 2, text=COL_LABELS[c], font=("Arial", 11, "bold"))
             
         for r in range(ROWS):
-            y = MARGIN + r * CELL_SIZE + CELL_SIZE / 2
-            self.canvas.create_text(MARGIN / 2, y, text=ROW_LABELS[r], font=("Arial", 11, "bold"))
+            self.canvas.create_text(MARGIN / 2, Y_CENTRES[r], text=ROW_LABELS[r], font=("Arial", 11, "bold"))
 
-        # Draw Cells
+        self.cell_rects = {}
+        self.cell_texts = {}
+        self._cell_state = {}
         for r in range(ROWS):
             for c in range(COLS):
-                x1 = MARGIN + c * CELL_SIZE
-                y1 = MARGIN + r * CELL_SIZE
-                x2 = x1 + CELL_SIZE
-                y2 = y1 + CELL_SIZE
-                
-                cell = self.grid_data.get((c, r))
-                
-                fill_color = "white"
-                text = ""
-                outline_color = "lightgray"
-                width = 1
-                
-                if cell:
-                    if cell['type'] == 'CAL':
-                        fill_color = "#ffcccc" # Light red for Cal
-                        text = f"{cell['conc']}"
-                        outline_color = "#ff8888"
-                    elif cell['type'] == 'EXP':
-                        # Cycle colors based on Experiment ID
-                        color_idx = (cell['exp'] - 1) % len(EXP_PALETTE)
-                        fill_color = EXP_PALETTE[color_idx]
-                        
-                        # Get Name
-                        s_name = self.subject_names.get((cell['exp'], cell['subj']), tk.StringVar()).get()
-                        if not s_name: s_name = f"S{cell['subj']}"
-                        
-                        text = f"{s_name}\nt{cell['samp']}"
-                        outline_color = "gray"
-                
-                # Selection Highlight
-                if self.cur_sel:
-                    c1, r1, c2, r2 = self.cur_sel
-                    if c1 <= c <= c2 and r1 <= r <= r2:
-                        fill_color = "#e0e0e0" # Neutral highlight during drag
-                
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=fill_color, outline=outline_color, width=width)
-                if text:
-                     self.canvas.create_text(x1+CELL_SIZE/2, y1+CELL_SIZE/2, text=text, font=("Arial", 7))
-
-        # Draw Subject Borders and Replicate Lines
-        self.draw_overlays()
-
-    def draw_overlays(self):
-        # We need to draw borders around contiguous blocks of the same Subject AND Experiment
+                k = designer_core.key(c, r)
+                self.cell_rects[k] = self.canvas.create_rectangle(
+                    X_EDGES[c], Y_EDGES[r], X_EDGES[c + 1], Y_EDGES[r + 1], fill="white", outline="lightgray", width=1)
+                self._cell_state[k] = ("white", "lightgray", "")
+        
+        # Selection highlight: above cell fills, below labels and overlays
+        self.sel_rect = self.canvas.create_rectangle(0, 0, 0, 0, fill="#e0e0e0", outline="gray", state="hidden")
+        self._shown_sel = None # Selection sel_rect currently shows (None: hidden)
         
         for r in range(ROWS):
             for c in range(COLS):
-                cell = self.grid_data.get((c, r))
-                if not cell or cell['type'] != 'EXP':
-                    continue
-                
-                x1 = MARGIN + c * CELL_SIZE
-                y1 = MARGIN + r * CELL_SIZE
-                x2 = x1 + CELL_SIZE
-                y2 = y1 + CELL_SIZE
-                
-                # Check neighbors
-                # Helper to check if neighbor is "different" (different Exp or different Subj)
-                def is_different(neighbor):
-                    if not neighbor: return True
-                    if neighbor['type'] != 'EXP': return True
-                    if neighbor['exp'] != cell['exp']: return True
-                    if neighbor['subj'] != cell['subj']: return True
-                    return False
-
-                # Top
-                top = self.grid_data.get((c, r-1))
-                if is_different(top):
-                     self.canvas.create_line(x1, y1, x2, y1, width=3, fill="black")
-                # Bottom
-                bot = self.grid_data.get((c, r+1))
-                if is_different(bot):
-                     self.canvas.create_line(x1, y2, x2, y2, width=3, fill="black")
-                # Left
-                left = self.grid_data.get((c-1, r))
-                if is_different(left):
-                     self.canvas.create_line(x1, y1, x1, y2, width=3, fill="black")
-                # Right
-                right = self.grid_data.get((c+1, r))
-                if is_different(right):
-                     self.canvas.create_line(x2, y1, x2, y2, width=3, fill="black")
-
-
-        # 2. Replicate Lines
-        # Connect R1 to R2, R2 to R3 etc within same Sample
-        # We iterate over all cells, find their next replicate
-        # Wait, simple approach: check neighbors. If same Sample, draw line between centers.
+                k = designer_core.key(c, r)
+                self.cell_texts[k] = self.canvas.create_text(X_CENTRES[c], Y_CENTRES[r], text="", font=("Arial", 7))
+
+        # Every possible border/replicate line, created hidden; draw_overlays
+        # only toggles their state. Flat order: horizontal borders (ROWS + 1, COLS),
+        # vertical borders (ROWS, COLS + 1), right links (ROWS, COLS - 1), down links (ROWS - 1, COLS)
+        self.overlay_items = []
+        for r in range(ROWS + 1):
+            for c in range(COLS):
+                self.overlay_items.append(self.canvas.create_line(
+                    X_EDGES[c], Y_EDGES[r], X_EDGES[c + 1], Y_EDGES[r], width=3, fill="black", state="hidden"))
+        for r in range(ROWS):
+            for c in range(COLS + 1):
+                self.overlay_items.append(self.canvas.create_line(
+                    X_EDGES[c], Y_EDGES[r], X_EDGES[c], Y_EDGES[r + 1], width=3, fill="black", state="hidden"))
         for r in range(ROWS):
+            for c in range(COLS - 1):
+                self.overlay_items.append(self.canvas.create_line(
+                    X_CENTRES[c], Y_CENTRES[r], X_CENTRES[c + 1], Y_CENTRES[r], width=2, fill="blue", state="hidden"))
+        for r in range(ROWS - 1):
             for c in range(COLS):
-                cell = self.grid_data.get((c, r))
-                if not cell or cell['type'] != 'EXP':
-                    continue
-                
-                cx = MARGIN + c * CELL_SIZE + CELL_SIZE / 2
-                cy = MARGIN + r * CELL_SIZE + CELL_SIZE / 2
-                
-                # Check right (Horizontal Reps)
-                right = self.grid_data.get((c+1, r))
-                if (right and right.get('type') == 'EXP' and 
-                    right.get('exp') == cell['exp'] and 
-                    right.get('subj') == cell['subj'] and 
-                    right.get('samp') == cell['samp']):
-                    n_cx = MARGIN + (c+1) * CELL_SIZE + CELL_SIZE / 2
-                    self.canvas.create_line(cx, cy, n_cx, cy, width=2, fill="blue")
-                
-                # Check down (Vertical Reps)
-                down = self.grid_data.get((c, r+1))
-                if (down and down.get('type') == 'EXP' and 
-                    down.get('exp') == cell['exp'] and 
-                    down.get('subj') == cell['subj'] and 
-                    down.get('samp') == cell['samp']):
-                    n_cy = MARGIN + (r+1) * CELL_SIZE + CELL_SIZE / 2
-                    self.canvas.create_line(cx, cy, cx, n_cy, width=2, fill="blue")
+                self.overlay_items.append(self.canvas.create_line(
+                    X_CENTRES[c], Y_CENTRES[r], X_CENTRES[c], Y_CENTRES[r + 1], width=2, fill="blue", state="hidden"))
+        self._overlay_shown = np.zeros(len(self.overlay_items), dtype=bool)
+
+    def on_name_change(self, key):
+        self._name_cache[key] = self.subject_names[key].get()
+        self._dirty |= ((self.cells['type'] == designer_core.CODE_EXP)
+                        & (self.cells['exp'] == key[0]) & (self.cells['subj'] == key[1]))
+        self.request_redraw()
+
+    def request_redraw(self, grid=True):
+        # Bursts of motion/typing events collapse into one redraw per idle cycle
+        self._redraw_grid = self._redraw_grid or grid
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.root.after_idle(self._do_redraw)
+
+    def _do_redraw(self):
+        self._redraw_pending = False
+        if self._redraw_grid:
+            self._redraw_grid = False
+            self.draw_grid()
+        self.draw_selection()
 
+    def draw_grid(self):
+        # Update Cells (only wells marked dirty, and of those only the ones whose look changed)
+        # Flat record order matches the cell_rects keys (r * COLS + c)
+        dirty = np.flatnonzero(self._dirty)
+        if not dirty.size:
+            return
+        self._dirty[:] = False
+        for k, (code, exp, subj, samp, rep, conc) in zip(dirty.tolist(), self.cells.ravel()[dirty].tolist()):
+            state = self._cell_look(code, exp, subj, samp, conc)
+            if state != self._cell_state[k]:
+                self._cell_state[k] = state
+                fill_color, outline_color, text = state
+                self.canvas.itemconfigure(self.cell_rects[k], fill=fill_color, outline=outline_color)
+                self.canvas.itemconfigure(self.cell_texts[k], text=text)
+
+        # Draw Subject Borders and Replicate Lines
+        self.draw_overlays()
+
+    def draw_selection(self):
+        # Move the single highlight rectangle instead of recoloring cells;
+        # motion inside the same cell leaves it untouched
+        if self.cur_sel == self._shown_sel:
+            return
+        self._shown_sel = self.cur_sel
+        if self.cur_sel:
+            c1, r1, c2, r2 = self.cur_sel
+            self.canvas.coords(self.sel_rect, X_EDGES[c1], Y_EDGES[r1], X_EDGES[c2 + 1], Y_EDGES[r2 + 1])
+            self.canvas.itemconfigure(self.sel_rect, state="normal")
+        else:
+            self.canvas.itemconfigure(self.sel_rect, state="hidden")
+
+    def draw_overlays(self):
+        # Borders around contiguous blocks of the same Subject AND Experiment,
+        # then replicate lines joining same-sample neighbours (centre to centre)
+        borders, links = designer_core.overlay_segments(self.cells)
+        
+        # Segment -> position in overlay_items (see _build_static_items)
+        n_h = (ROWS + 1) * COLS
+        n_v = ROWS * (COLS + 1)
+        n_right = ROWS * (COLS - 1)
+        c1, r1, c2, r2 = borders.T
+        horiz = r1 == r2
+        border_idx = np.where(horiz, r1 * COLS + c1, n_h + r1 * (COLS + 1) + c1)
+        c1, r1, c2, r2 = links.T
+        link_idx = np.where(r1 == r2, n_h + n_v + r1 * (COLS - 1) + c1,
+                            n_h + n_v + n_right + r1 * COLS + c1)
+        
+        shown = np.zeros_like(self._overlay_shown)
+        shown[border_idx] = True
+        shown[link_idx] = True
+        
+        for i in np.nonzero(shown != self._overlay_shown)[0].tolist():
+            self.canvas.itemconfigure(self.overlay_items[i], state="normal" if shown[i] else "hidden")
+        self._overlay_shown = shown
 
     def get_cell_coords(self, event):
         x = event.x - MARGIN
@@ -383,7 +422,7 @@ class ElisaPlateDesigner:
         if coords:
             self.start_sel = coords
             self.cur_sel = (coords[0], coords[1], coords[0], coords[1])
-            self.draw_grid()
+            self.request_redraw(grid=False)
 
     def on_drag(self, event):
         if not self.start_sel: return
@@ -394,7 +433,7 @@ class ElisaPlateDesigner:
             c2 = max(self.start_sel[0], coords[0])
             r2 = max(self.start_sel[1], coords[1])
             self.cur_sel = (c1, r1, c2, r2)
-            self.draw_grid()
+            self.request_redraw(grid=False)
 
     def on_release(self, event):
         if self.cur_sel:
@@ -403,15 +442,17 @@ class ElisaPlateDesigner:
             self.refresh_sidebar() # Update list
             self.cur_sel = None
             self.start_sel = None
+            self.draw_selection()
             self.draw_grid()
             self.update_status()
 
     def save_state(self):
-        # Deep copy grid_data, restore variables
+        # Record the state variables; the wells an action overwrites are
+        # attached afterwards by record_cells (no grid copy per step)
         # Note: We probably shouldn't undo subject names logic here, 
         # but if we undo a subject creation, the name field should eventually disappear.
         state = {
-            'grid': copy.deepcopy(self.grid_data),
+            'diff': None,
             'exp': self.current_exp,
             'subj': self.current_subj,
             'samp': self.next_sample_id,
@@ -419,10 +460,18 @@ class ElisaPlateDesigner:
         }
         self.history.append(state)
 
+    def record_cells(self, idx):
+        # Attach the previous contents of cells[idx] to the latest undo entry
+        if self.history:
+            self.history[-1]['diff'] = (idx, self.cells[idx].copy())
+
     def on_undo(self, event=None):
         if self.history:
             state = self.history.pop()
-            self.grid_data = state['grid']
+            if state['diff'] is not None:
+                idx, prev = state['diff']
+                self.cells[idx] = prev
+                self._dirty[idx] = True
             self.current_exp = state['exp']
             self.current_subj = state['subj']
             self.next_sample_id = state['samp']
@@ -446,14 +495,22 @@ class ElisaPlateDesigner:
             self.next_sample_id = 0
             self.subject_closed = False
 
-        # Fill Logic from Core
-        updates, new_samp_id = designer_core.fill_cells(
-            c1, r1, c2, r2, 
-            self.current_exp, self.current_subj, self.next_sample_id, 
-            self.orientation
+        # Fill Logic from Core: the selection is a rectangle, so every field
+        # is written through one slice of the cell array
+        block = (slice(r1, r2 + 1), slice(c1, c2 + 1))
+        samps, reps, new_samp_id = designer_core.fill_block(
+            r2 - r1 + 1, c2 - c1 + 1, self.next_sample_id, self.orientation
         )
         
-        self.grid_data.update(updates)
+        self.record_cells(block)
+        
+        self.cells['type'][block] = designer_core.CODE_EXP
+        self.cells['exp'][block] = self.current_exp
+        self.cells['subj'][block] = self.current_subj
+        self.cells['samp'][block] = samps
+        self.cells['rep'][block] = reps
+        self.cells['conc'][block] = 0.0
+        self._dirty[block] = True
         self.next_sample_id = new_samp_id
 
     def on_space(self, event):
@@ -487,12 +544,10 @@ class ElisaPlateDesigner:
         filename = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")])
         if not filename: return
         
-        # Create map of subject names for export
-        # subject_names is dict of StringVars
-        name_map = {k: v.get() for k, v in self.subject_names.items()}
-        
+        # Subject names for export: the plain-str cache also covers imported
+        # names whose StringVars have not been created yet
         try:
-            df = designer_core.grid_to_dataframe(self.grid_data, name_map)
+            df = designer_core.cells_to_dataframe(self.cells, self._name_cache)
             df.to_csv(filename, index=False)
             messagebox.showinfo("Success", f"Exported to {filename}")
         except PermissionError:
@@ -507,16 +562,19 @@ class ElisaPlateDesigner:
         try:
             df = pd.read_csv(filename)
             self.save_state()
+            self.record_cells((slice(None), slice(None)))
             
             # Use Core
             new_grid, new_names, state = designer_core.dataframe_to_grid(df)
             
-            self.grid_data = new_grid
+            self.cells = designer_core.grid_to_cells(new_grid).reshape(ROWS, COLS)
+            self._dirty[:] = True
             
-            # Restore names (convert strings to Vars)
+            # Restore names; StringVars are only created once the sidebar shows them
             self.subject_names = {}
-            for k, name in new_names.items():
-                self.subject_names[k] = tk.StringVar(value=name)
+            self._pending_names = dict(new_names)
+            self._name_cache = dict(new_names)
+            self._last_subjs = None # New StringVars: entries must be rebuilt
             
             self.current_exp = state['current_exp']
             self.current_subj = state['current_subj']
@@ -533,131 +591,57 @@ class ElisaPlateDesigner:
         filename = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG", "*.png")])
         if not filename: return
 
-        # Create Image
-        img_width = WIN_WIDTH
-        img_height = WIN_HEIGHT
-        img = Image.new("RGB", (img_width, img_height), "white")
+        self._render_to_image().save(filename)
+        messagebox.showinfo("Success", f"Exported to {filename}")
+
+    def _render_to_image(self):
+        # The plate as a PIL image, from the same cell looks as the canvas
+        # Cell looks (fill, outline, label) in flat r * COLS + c order
+        fills, outlines, texts = zip(*[self._cell_look(code, exp, subj, samp, conc)
+                                       for code, exp, subj, samp, rep, conc in self.cells.ravel().tolist()])
+
+        # Create Image: paint fills and 1px outlines straight into an RGB buffer.
+        # Each pixel belongs to one cell; shared edges go to the cell right/below,
+        # exactly as when the rectangles were drawn one after another.
+        rgb = {name: ImageColor.getrgb(name) for name in set(fills) | set(outlines)}
+        fill_rgb = np.array([rgb[f] for f in fills], dtype=np.uint8)
+        outline_rgb = np.array([rgb[o] for o in outlines], dtype=np.uint8)
+        
+        xs = np.arange(X_EDGES[0], X_EDGES[-1] + 1)
+        ys = np.arange(Y_EDGES[0], Y_EDGES[-1] + 1)
+        owner = (np.minimum((ys - MARGIN) // CELL_SIZE, ROWS - 1)[:, None] * COLS
+                 + np.minimum((xs - MARGIN) // CELL_SIZE, COLS - 1)[None, :])
+        on_edge = ((ys - MARGIN) % CELL_SIZE == 0)[:, None] | ((xs - MARGIN) % CELL_SIZE == 0)[None, :]
+        
+        arr = np.full((WIN_HEIGHT, WIN_WIDTH, 3), 255, dtype=np.uint8)
+        arr[ys[0]:ys[-1] + 1, xs[0]:xs[-1] + 1] = np.where(on_edge[..., None], outline_rgb[owner], fill_rgb[owner])
+        img = Image.fromarray(arr)
         draw = ImageDraw.Draw(img)
         
-        # Load Fonts (Default simple)
-        try:
-            font = ImageFont.truetype("arial.ttf", 14)
-            small_font = ImageFont.truetype("arial.ttf", 9)
-        except:
-             font = ImageFont.load_default()
-             small_font = ImageFont.load_default()
+        font, small_font = _get_fonts()
 
         # Draw Labels
         for c in range(COLS):
-            x = MARGIN + c * CELL_SIZE + CELL_SIZE / 2
-            draw.text((x, MARGIN / 2), COL_LABELS[c], fill="black", font=font, anchor="mm")
-            
-        for r in range(ROWS):
-            y = MARGIN + r * CELL_SIZE + CELL_SIZE / 2
-            draw.text((MARGIN / 2, y), ROW_LABELS[r], fill="black", font=font, anchor="mm")
+            draw.text((X_CENTRES[c], MARGIN / 2), COL_LABELS[c], fill="black", font=font, anchor="mm")
             
-        # Draw Grid
         for r in range(ROWS):
-            for c in range(COLS):
-                x1 = MARGIN + c * CELL_SIZE
-                y1 = MARGIN + r * CELL_SIZE
-                x2 = x1 + CELL_SIZE
-                y2 = y1 + CELL_SIZE
-                
-                cell = self.grid_data.get((c, r))
-                
-                fill_color = "white"
-                outline_color = "lightgray"
-                text = ""
-                
-                if cell:
-                    if cell['type'] == 'CAL':
-                        fill_color = "#ffcccc"
-                        text = f"{cell['conc']}"
-                        outline_color = "#ff8888"
-                    elif cell['type'] == 'EXP':
-                        color_idx = (cell['exp'] - 1) % len(EXP_PALETTE)
-                        fill_color = EXP_PALETTE[color_idx]
-                        
-                        # Get Name
-                        s_name = self.subject_names.get((cell['exp'], cell['subj']), tk.StringVar()).get()
-                        if not s_name: s_name = f"S{cell['subj']}"
-                        
-                        text = f"{s_name}\nt{cell['samp']}"
-                        outline_color = "gray"
-                
-                draw.rectangle([x1, y1, x2, y2], fill=fill_color, outline=outline_color)
-                if text:
-                    draw.text((x1+CELL_SIZE/2, y1+CELL_SIZE/2), text, fill="black", font=small_font, anchor="mm")
+            draw.text((MARGIN / 2, Y_CENTRES[r]), ROW_LABELS[r], fill="black", font=font, anchor="mm")
+        
+        for k, text in enumerate(texts):
+            if text:
+                r, c = divmod(k, COLS)
+                draw.text((X_CENTRES[c], Y_CENTRES[r]), text, fill="black", font=small_font, anchor="mm")
 
-        # Draw Borders (Subject/Experiment Delimiter)
-        for r in range(ROWS):
-            for c in range(COLS):
-                cell = self.grid_data.get((c, r))
-                if not cell or cell['type'] != 'EXP':
-                    continue
-                
-                x1 = MARGIN + c * CELL_SIZE
-                y1 = MARGIN + r * CELL_SIZE
-                x2 = x1 + CELL_SIZE
-                y2 = y1 + CELL_SIZE
-
-                # Helper to check if neighbor is "different" (different Exp or different Subj)
-                def is_different_img(neighbor):
-                    if not neighbor: return True
-                    if neighbor['type'] != 'EXP': return True
-                    if neighbor['exp'] != cell['exp']: return True
-                    if neighbor['subj'] != cell['subj']: return True
-                    return False
-                
-                # Check neighbors and draw lines
-                # Top
-                top = self.grid_data.get((c, r-1))
-                if is_different_img(top):
-                    draw.line([x1, y1, x2, y1], fill="black", width=3)
-                # Bottom
-                bot = self.grid_data.get((c, r+1))
-                if is_different_img(bot):
-                    draw.line([x1, y2, x2, y2], fill="black", width=3)
-                # Left
-                left = self.grid_data.get((c-1, r))
-                if is_different_img(left):
-                    draw.line([x1, y1, x1, y2], fill="black", width=3)
-                # Right
-                right = self.grid_data.get((c+1, r))
-                if is_different_img(right):
-                    draw.line([x2, y1, x2, y2], fill="black", width=3)
-        
-        # Draw Replicate Lines
-        for r in range(ROWS):
-            for c in range(COLS):
-                cell = self.grid_data.get((c, r))
-                if not cell or cell['type'] != 'EXP':
-                    continue
-                
-                cx = MARGIN + c * CELL_SIZE + CELL_SIZE / 2
-                cy = MARGIN + r * CELL_SIZE + CELL_SIZE / 2
-                
-                # Right
-                right = self.grid_data.get((c+1, r))
-                if (right and right.get('type') == 'EXP' and 
-                    right.get('exp') == cell['exp'] and 
-                    right.get('subj') == cell['subj'] and 
-                    right.get('samp') == cell['samp']):
-                    n_cx = MARGIN + (c+1) * CELL_SIZE + CELL_SIZE / 2
-                    draw.line([cx, cy, n_cx, cy], fill="blue", width=2)
-                
-                # Down
-                down = self.grid_data.get((c, r+1))
-                if (down and down.get('type') == 'EXP' and 
-                    down.get('exp') == cell['exp'] and 
-                    down.get('subj') == cell['subj'] and 
-                    down.get('samp') == cell['samp']):
-                    n_cy = MARGIN + (r+1) * CELL_SIZE + CELL_SIZE / 2
-                    draw.line([cx, cy, cx, n_cy], fill="blue", width=2)
-        
-        img.save(filename)
-        messagebox.showinfo("Success", f"Exported to {filename}")
+        # Draw Borders (Subject/Experiment Delimiter) and Replicate Lines
+        borders, links = designer_core.overlay_segments(self.cells)
+        
+        for x1, y1, x2, y2 in (MARGIN + borders * CELL_SIZE).tolist():
+            draw.line([x1, y1, x2, y2], fill="black", width=3)
+        
+        for x1, y1, x2, y2 in (MARGIN + links * CELL_SIZE + CELL_SIZE / 2).tolist():
+            draw.line([x1, y1, x2, y2], fill="blue", width=2)
+        
+        return img
 
 if __name__ == "__main__":
     root = tk.Tk()
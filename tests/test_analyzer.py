@@ -0,0 +1,43 @@
+import unittest
+import pandas as pd
+import sys
+import os
+import tempfile
+
+# Add parent directory to path to import the analyzer
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'analyzer'))
+
+import elisa_data_analyzer
+
+class TestElisaAnalyzer(unittest.TestCase):
+    
+    def test_generate_plots_all_blank_subject_names(self):
+        """Test that all three plots are written when no experiment well has a Subject Name."""
+        with tempfile.TemporaryDirectory() as tmp:
+            layout = pd.read_csv(os.path.join(ROOT, 'example_layout.csv'))
+            layout['Subject Name'] = ''
+            layout_path = os.path.join(tmp, 'layout.csv')
+            layout.to_csv(layout_path, index=False)
+            
+            app = elisa_data_analyzer.ElisaAnalyzer()
+            app.layout_path = layout_path
+            app.instrument_path = os.path.join(ROOT, 'insulin ELISA example.xlsx')
+            app.process_data()
+            self.assertEqual(len(app.subject_labels), 0)
+            
+            app.config = {'timepoints': ['t0', 't1'], 'paired': True, 'tails': 'two-sided', 'posthoc': False}
+            app.run_statistics()
+            
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                app.generate_plots()
+            finally:
+                os.chdir(cwd)
+            
+            for name in ('calibration_curve.png', 'results_bar_graph.png', 'average_plot.png'):
+                self.assertTrue(os.path.exists(os.path.join(tmp, name)), name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
 import pandas as pd
 import numpy as np
+from scipy import stats
 import sys
 import os
+import tempfile
 
 # Add parent directory to path to import elisa_core
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'analyzer'))
@@ -25,6 +27,16 @@ class TestElisaCore(unittest.TestCase):
         self.assertAlmostEqual(model['intercept'], 1.0)
         self.assertAlmostEqual(model['r_squared'], 1.0)
         
+    def test_fit_calibration_model_single_concentration(self):
+        """Test that standards at a single concentration fail loudly instead of giving a nan slope."""
+        data = pd.DataFrame({
+            'Type': ['Calibration'] * 3,
+            'Concentration': [5, 5, 5],
+            'OD_Corr': [1.0, 1.1, 0.9]
+        })
+        with self.assertRaises(ValueError):
+            elisa_core.fit_calibration_model(data)
+
     def test_calculate_concentrations(self):
         """Test concentration calculation from model."""
         model = {'slope': 2.0, 'intercept': 1.0, 'r_squared': 1.0}
@@ -63,6 +75,21 @@ class TestElisaCore(unittest.TestCase):
         # Check empty row (C is index 24)
         self.assertTrue(pd.isna(grid.iloc[24]['OD']))
         
+    def test_extract_grid_non_numeric_cells(self):
+        """Test that non-numeric readings (e.g. Tecan 'OVER') become NaN."""
+        rows = [['<>'] + [np.nan]*12]
+        for label in 'ABCDEFGH':
+            rows.append([label] + [0.5]*12)
+        rows[1][3] = 'OVER'
+        rows[2][1] = ''
+        
+        grid = elisa_core.extract_grid(pd.DataFrame(rows), 1)
+        
+        self.assertTrue(pd.isna(grid.iloc[2]['OD']))   # A3
+        self.assertTrue(pd.isna(grid.iloc[12]['OD']))  # B1
+        self.assertAlmostEqual(grid.iloc[13]['OD'], 0.5)
+        self.assertEqual(grid['OD'].dtype, np.float64)
+        
     def test_merge_and_correct(self):
         """Test merging of 450 and 630 dataframes."""
         layout = pd.DataFrame({'Well': ['A1'], 'Type': ['Sample']})
@@ -99,5 +126,110 @@ class TestElisaCore(unittest.TestCase):
         except ValueError as e:
             self.fail(f"run_statistical_analysis raised ValueError with duplicate names: {e}")
 
+    def test_run_statistical_analysis_blank_names_and_missing_subject(self):
+        """Test default names for blank rows, with a named row missing its Subject ID."""
+        data = pd.DataFrame({
+            'Type': ['Experiment'] * 7,
+            'Subject': [1, 1, 2, 2, 3, 3, np.nan],
+            'Subject Name': ['', '', 'B', 'B', np.nan, np.nan, 'Stray'],
+            'Timepoint': ['t0', 't1', 't0', 't1', 't0', 't1', 't0'],
+            'Calculated_Conc': [10, 20, 12, 22, 11, 21, 15]
+        })
+        config = {'timepoints': ['t0', 't1'], 'paired': True, 'tails': 'two-sided', 'posthoc': False}
+        
+        elisa_core.run_statistical_analysis(data, config)
+        self.assertEqual(data['Subject Name'].tolist(),
+                         ['Subject 1', 'Subject 1', 'B', 'B', 'Subject 3', 'Subject 3', 'Stray'])
+
+    def test_run_statistical_analysis_high_cv_keeps_subjects_apart(self):
+        """Test that subjects sharing an ID across experiments get separate CV rows."""
+        # Subject IDs restart per experiment: ID 1 is 'Mouse A' in exp 1 and 'Mouse B' in exp 2
+        data = pd.DataFrame({
+            'Type': ['Experiment'] * 4,
+            'Subject': [1, 1, 1, 1],
+            'Subject Name': ['Mouse A', 'Mouse A', 'Mouse B', 'Mouse B'],
+            'Timepoint': ['t0'] * 4,
+            'Calculated_Conc': [10, 20, 30, 60]
+        })
+        config = {'timepoints': ['t0', 't1'], 'paired': True, 'tails': 'two-sided', 'posthoc': False}
+        
+        results = elisa_core.run_statistical_analysis(data, config)
+        high_cv = results['High_CV']
+        self.assertEqual(high_cv['Subject Name'].tolist(), ['Mouse A', 'Mouse B'])
+        self.assertEqual(high_cv['mean'].tolist(), [15.0, 45.0])
+
+    def test_run_statistical_analysis_pairs_subjects_per_experiment(self):
+        """Test that paired tests pair each animal, not subjects pooled by a shared ID."""
+        # Subject IDs 1-3 restart in the second experiment under different names
+        t0 = [10.0, 12.5, 11.2, 13.1, 12.0, 10.8]
+        t1 = [12.1, 15.0, 13.0, 16.2, 14.5, 12.9]
+        data = pd.DataFrame({
+            'Type': ['Experiment'] * 12,
+            'Subject': [1, 2, 3, 1, 2, 3] * 2,
+            'Subject Name': ['A1', 'A2', 'A3', 'B1', 'B2', 'B3'] * 2,
+            'Timepoint': ['t0'] * 6 + ['t1'] * 6,
+            'Calculated_Conc': t0 + t1
+        })
+        config = {'timepoints': ['t0', 't1'], 'paired': True, 'tails': 'two-sided', 'posthoc': False}
+        
+        results = elisa_core.run_statistical_analysis(data, config)
+        
+        # Six pairs, one per animal (pooling by ID would leave three)
+        self.assertEqual(results['test_decision'], 'Paired T-Test')
+        self.assertAlmostEqual(results['p_value'], stats.ttest_rel(t0, t1).pvalue)
+
+    def test_parse_tecan_excel_cache_invalidated_on_change(self):
+        """Test that the parse cache is keyed on file modification time."""
+        def write_plate(path, od):
+            rows = [['<>'] + [''] * 12]
+            rows += [[label] + [od] * 12 for label in 'ABCDEFGH']
+            rows += [['<>'] + [''] * 12]
+            rows += [[label] + [0.05] * 12 for label in 'ABCDEFGH']
+            pd.DataFrame(rows).to_csv(path, header=False, index=False)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'plate.csv')
+            write_plate(path, 0.5)
+            od450, _ = elisa_core.parse_tecan_excel(path)
+            self.assertAlmostEqual(od450.iloc[0]['OD'], 0.5)
+            
+            # Mutating the returned frame must not leak into the cache
+            od450.loc[0, 'OD'] = 99.0
+            od450, _ = elisa_core.parse_tecan_excel(path)
+            self.assertAlmostEqual(od450.iloc[0]['OD'], 0.5)
+            
+            write_plate(path, 0.7)
+            mtime = os.path.getmtime(path)
+            os.utime(path, (mtime + 10, mtime + 10))
+            od450, _ = elisa_core.parse_tecan_excel(path)
+            self.assertAlmostEqual(od450.iloc[0]['OD'], 0.7)
+
+    def test_run_statistical_analysis_posthoc_bonferroni(self):
+        """Test that post-hoc reports Bonferroni-adjusted p-values."""
+        subjects = [1, 2, 3, 4, 5, 6]
+        data = pd.DataFrame({
+            'Type': ['Experiment'] * 18,
+            'Subject': subjects * 3,
+            'Subject Name': [''] * 18,
+            'Timepoint': ['t0'] * 6 + ['t1'] * 6 + ['t2'] * 6,
+            'Calculated_Conc': [10, 11, 12, 10.5, 11.5, 12.5,
+                                20, 21, 22, 20.5, 21.5, 22.5,
+                                30, 31, 32, 30.5, 31.5, 32.5]
+        })
+        
+        config = {
+            'timepoints': ['t0', 't1', 't2'],
+            'paired': False,
+            'tails': 'two-sided',
+            'posthoc': True
+        }
+        
+        results = elisa_core.run_statistical_analysis(data, config)
+        posthoc = results['posthoc']
+        
+        self.assertEqual(list(posthoc['Comparison']), ['t0 vs t1', 't0 vs t2', 't1 vs t2'])
+        np.testing.assert_allclose(posthoc['P-Adj'], np.minimum(posthoc['P-Value'] * 3, 1.0))
+        self.assertTrue((posthoc['Sig (Bonf)'] == np.where(posthoc['P-Adj'] < 0.05, '*', 'ns')).all())
+
 if __name__ == '__main__':
     unittest.main()
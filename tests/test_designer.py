@@ -1,5 +1,6 @@
 import unittest
 import pandas as pd
+import numpy as np
 import sys
 import os
 
@@ -10,52 +11,62 @@ import designer_core
 
 class TestDesignerCore(unittest.TestCase):
     
-    def test_fill_cells_vertical(self):
+    def test_fill_block_vertical(self):
         """Test vertical fill logic (Unique samples vary by Column)."""
         # Select 2x2 grid: (0,0) to (1,1)
         # Vertical: (0,0) is s0_r1, (0,1) is s0_r2. (1,0) is s1_r1, (1,1) is s1_r2.
         
-        updates, next_id = designer_core.fill_cells(0, 0, 1, 1, 1, 1, 0, 'vertical')
+        samps, reps, next_id = designer_core.fill_block(2, 2, 0, 'vertical')
         
-        self.assertEqual(len(updates), 4)
+        self.assertEqual(samps.shape, (2, 2))
         
         # Col 0, Row 0 -> Sample 0
-        self.assertEqual(updates[(0,0)]['samp'], 0)
-        self.assertEqual(updates[(0,0)]['rep'], 1)
+        self.assertEqual((samps[0, 0], reps[0, 0]), (0, 1))
         
         # Col 0, Row 1 -> Sample 0 (Rep 2)
-        self.assertEqual(updates[(0,1)]['samp'], 0)
-        self.assertEqual(updates[(0,1)]['rep'], 2)
+        self.assertEqual((samps[1, 0], reps[1, 0]), (0, 2))
         
         # Col 1, Row 0 -> Sample 1
-        self.assertEqual(updates[(1,0)]['samp'], 1)
-        self.assertEqual(updates[(1,0)]['rep'], 1)
+        self.assertEqual((samps[0, 1], reps[0, 1]), (1, 1))
         
         self.assertEqual(next_id, 2)
         
-    def test_fill_cells_horizontal(self):
+    def test_fill_block_horizontal(self):
         """Test horizontal fill logic (Unique samples vary by Row)."""
         # Select 2x2 grid: (0,0) to (1,1)
         # Horizontal: (0,0) is s0_r1, (1,0) is s0_r2. (0,1) is s1_r1...
         
-        updates, next_id = designer_core.fill_cells(0, 0, 1, 1, 1, 1, 0, 'horizontal')
+        samps, reps, next_id = designer_core.fill_block(2, 2, 0, 'horizontal')
         
         # Row 0, Col 0 -> Sample 0
-        self.assertEqual(updates[(0,0)]['samp'], 0)
+        self.assertEqual(samps[0, 0], 0)
         # Row 0, Col 1 -> Sample 0 (Rep 2)
-        self.assertEqual(updates[(1,0)]['samp'], 0)
+        self.assertEqual((samps[0, 1], reps[0, 1]), (0, 2))
         
         # Row 1, Col 0 -> Sample 1
-        self.assertEqual(updates[(0,1)]['samp'], 1)
+        self.assertEqual(samps[1, 0], 1)
         
         self.assertEqual(next_id, 2)
 
+    def test_fill_block_offset_and_shape(self):
+        """Test a non-square block continuing from an existing sample id."""
+        # 2 rows x 3 cols starting at t5
+        samps, reps, next_id = designer_core.fill_block(2, 3, 5, 'vertical')
+        self.assertEqual(samps.tolist(), [[5, 6, 7], [5, 6, 7]])
+        self.assertEqual(reps.tolist(), [[1, 1, 1], [2, 2, 2]])
+        self.assertEqual(next_id, 8)
+        
+        samps, reps, next_id = designer_core.fill_block(2, 3, 5, 'horizontal')
+        self.assertEqual(samps.tolist(), [[5, 5, 5], [6, 6, 6]])
+        self.assertEqual(reps.tolist(), [[1, 2, 3], [1, 2, 3]])
+        self.assertEqual(next_id, 7)
+
     def test_grid_to_dataframe_and_back(self):
         """Test round trip conversion."""
         # Setup mock grid
         grid = {
-            (0,0): {'type': 'CAL', 'conc': 100.0},
-            (1,0): {'type': 'EXP', 'exp': 1, 'subj': 1, 'samp': 99, 'rep': 1}
+            designer_core.key(0,0): designer_core.Cell('CAL', conc=100.0),
+            designer_core.key(1,0): designer_core.Cell('EXP', exp=1, subj=1, samp=99, rep=1)
         }
         names = {(1, 1): "TestSubject"}
         
@@ -73,9 +84,76 @@ class TestDesignerCore(unittest.TestCase):
         new_grid, new_names, state = designer_core.dataframe_to_grid(df)
         
         # Verify Grid content
-        self.assertEqual(new_grid[(0,0)]['type'], 'CAL')
-        self.assertEqual(new_grid[(1,0)]['samp'], 99)
+        self.assertEqual(new_grid[designer_core.key(0,0)].type, 'CAL')
+        self.assertEqual(new_grid[designer_core.key(1,0)].samp, 99)
         self.assertEqual(new_names[(1,1)], "TestSubject")
 
+    def test_dataframe_to_grid_rejects_non_integer_fields(self):
+        """Test that non-integer wells/ids are skipped and blank calibration stays NaN."""
+        df = pd.DataFrame({
+            'Well': ['H1', 'G1', 'B3.0', 'A5', 'A6', 'A7'],
+            'Type': ['Calibration', 'Calibration', 'Experiment', 'Experiment', 'Experiment', 'Experiment'],
+            'Concentration': [None, 'abc', None, None, None, None],
+            'Experiment': [None, None, 1, 1, 1.7, 1],
+            'Subject': [None, None, 1, 1, 1, 1],
+            'Timepoint': [None, None, 't0', 't1.5', 't0', 't2'],
+            'Replicate': [None, None, 1, 1, 1, 1],
+            'Subject Name': [None, None, '', '', '', '']
+        })
+        grid, names, state = designer_core.dataframe_to_grid(df)
+        
+        # Blank concentration is not a 0 standard; an unparsable one still reads as 0.0
+        self.assertTrue(np.isnan(grid[designer_core.key(0, 0)].conc))
+        self.assertEqual(grid[designer_core.key(1, 0)].conc, 0.0)
+        
+        # 'B3.0', 't1.5' and Experiment 1.7 are malformed; only A7 is imported
+        exp_keys = [k for k, cell in grid.items() if cell.type == 'EXP']
+        self.assertEqual(exp_keys, [designer_core.key(7, 6)])
+        self.assertEqual(grid[designer_core.key(7, 6)].samp, 2)
+
+    def test_grid_to_cells_packing(self):
+        """Test packed record layout (flat index r * COLS + c)."""
+        grid = {
+            designer_core.key(2,0): designer_core.Cell('CAL', conc=1.6),
+            designer_core.key(1,3): designer_core.Cell('EXP', exp=2, subj=3, samp=4, rep=2)
+        }
+        cells = designer_core.grid_to_cells(grid)
+
+        self.assertEqual(len(cells), designer_core.ROWS * designer_core.COLS)
+        self.assertEqual(cells[2]['type'], designer_core.CODE_CAL)
+        self.assertAlmostEqual(cells[2]['conc'], 1.6)
+
+        exp_cell = cells[3 * designer_core.COLS + 1]
+        self.assertEqual(exp_cell['type'], designer_core.CODE_EXP)
+        self.assertEqual((exp_cell['exp'], exp_cell['subj'], exp_cell['samp'], exp_cell['rep']), (2, 3, 4, 2))
+
+        # Everything else stays empty
+        self.assertEqual(int((cells['type'] == designer_core.CODE_EMPTY).sum()), len(cells) - 2)
+
+    def test_overlay_segments(self):
+        """Test border/replicate detection on a 2x2 subject block."""
+        cells = designer_core.EMPTY_CELLS.reshape(designer_core.ROWS, designer_core.COLS).copy()
+        # Rows 2-3, Cols 0-1: one subject, vertical replicates (sample per column)
+        cells['type'][2:4, 0:2] = designer_core.CODE_EXP
+        cells['exp'][2:4, 0:2] = 1
+        cells['subj'][2:4, 0:2] = 1
+        cells['samp'][2:4, 1] = 1
+        # Neighbouring subject in Col 2 shares the right-hand edge
+        cells['type'][2, 2] = designer_core.CODE_EXP
+        cells['exp'][2, 2] = 1
+        cells['subj'][2, 2] = 2
+
+        borders, links = designer_core.overlay_segments(cells)
+        borders = {tuple(b) for b in borders.tolist()}
+
+        # Outline of the block (corner units), no line between its own wells
+        self.assertIn((0, 2, 1, 2), borders)  # top
+        self.assertIn((1, 4, 2, 4), borders)  # bottom
+        self.assertIn((2, 2, 2, 3), borders)  # right, against subject 2
+        self.assertNotIn((1, 2, 1, 3), borders)
+
+        # Replicates link down each column, never across samples
+        self.assertEqual(sorted(map(tuple, links.tolist())), [(0, 2, 0, 3), (1, 2, 1, 3)])
+
 if __name__ == '__main__':
     unittest.main()